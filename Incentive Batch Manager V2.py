@@ -3,47 +3,703 @@ Incentive Batch Splitter & Mail Merge
 Complete workflow: Split Master Incentive Log by SalesPersonID,
 sync email lists, and distribute via Outlook.
 
+Runs the GUI by default; pass a command for headless runs, e.g.
+    python "Incentive Batch Manager V2.py" split --year 2026 --batch 10/15
+(commands: split, assess, mgmt, send - see --help).
+
 Author: Josh Perry - TD Analyst, Breakthru Beverage Group
 """
 
-import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+import argparse
 import pandas as pd
+import numpy as np
 from pathlib import Path
 import os
+import re
+import sys
 import shutil
 import tempfile
 import random
+import hashlib
+import io
+import json
+import queue
+import smtplib
+import ssl
+import mimetypes
+import sqlite3
+import threading
+import time
+from contextlib import closing
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
-from openpyxl import load_workbook
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import PatternFill, Font, Alignment
 from openpyxl.utils import get_column_letter
 
+# Tk import - headless runs work on Pythons built without it
+try:
+    import tkinter as tk
+    from tkinter import ttk, messagebox, filedialog
+    TK_AVAILABLE = True
+except ImportError:
+    TK_AVAILABLE = False
+
 # Outlook import - will fail gracefully if not on Windows
 try:
     import win32com.client as win32
+    import pythoncom
     OUTLOOK_AVAILABLE = True
 except ImportError:
     OUTLOOK_AVAILABLE = False
 
+# Parquet cache - falls back to a pickle cache if pyarrow is not installed
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
 
-class IncentiveBatchManager:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("Incentive Batch Manager")
-        self.root.geometry("750x1100")
-        self.root.resizable(False, False)
+# Calamine (Rust) xlsx parser - falls back to openpyxl in read-only mode if not installed
+try:
+    import python_calamine  # noqa: F401
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
+EXCEL_ENGINES = ['calamine', 'openpyxl']
+
+# Bump when the cached master frame layout changes so old caches are rebuilt
+MASTER_CACHE_VERSION = 3
+
+# Management levels: (level code, hierarchy ID column, hierarchy name column)
+MANAGER_LEVELS = [
+    ('VP', 'Vice President ID', 'Vice President Name'),
+    ('DIRECTOR', 'Division Manager ID', 'Division Manager Name'),
+    ('AM', 'Area Manager ID', 'Area Manager Name'),
+    ('FSM', 'Field Sales Manager ID', 'Field Sales Manager Name')
+]
+
+# ===== Source Columns =====
+# Only these columns are parsed from the email and hierarchy workbooks (the
+# Master Incentive Log is read with the engine's output_columns). ID columns
+# are read as raw cell values and normalized after loading.
+EMAIL_ID_COLUMNS = ['SU01 Acct #', 'HR Supervisor #', 'HR 2nd Line Manager #']
+EMAIL_COLUMNS = ['SU01 Acct #', 'SU01 Email', 'SU01 Name', 'HR Supervisor #', 'HR 2nd Line Manager #']
+HIERARCHY_ID_COLUMNS = [
+    'Sales Person ID', 'Field Sales Manager ID',
+    'Area Manager ID', 'Division Manager ID', 'Vice President ID'
+]
+HIERARCHY_COLUMNS = HIERARCHY_ID_COLUMNS + ['Division Manager Position ID'] + [
+    name_col for _, _, name_col in MANAGER_LEVELS
+]
+
+# Compact types for the Master Incentive Log, applied once at load time:
+# 'id' -> integer keys, 'money' -> float64, 'date' -> datetime64,
+# 'category' -> categorical (few distinct strings repeated on every row)
+MASTER_SCHEMA = {
+    'Incentive #': 'id', 'SalesPersonID': 'id', 'Position ID': 'id', 'Batch Year': 'id',
+    'Payout': 'money',
+    'Start Date': 'date', 'End Date': 'date',
+    'Paid On Batch': 'category', 'Supplier': 'category', 'Channel': 'category',
+    'Sales Role': 'category', 'Payout Type': 'category', 'Tracking Method': 'category',
+    'Submitted By': 'category'
+}
+
+# Breakdown columns of the per-batch aggregate cube (below year and batch)
+BATCH_CUBE_COLUMNS = ['SalesPersonID', 'Supplier', 'Channel']
+
+# How often the GUI checks the source workbooks for changes
+SOURCE_POLL_MS = 2000
+
+# ===== Workbook Styling =====
+HEADER_FILL = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+HEADER_FONT = Font(bold=True, color="FFFFFF")
+HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="center")
+CURRENCY_FORMAT = '"$"#,##0.00'
+
+
+def column_widths(df):
+    """Excel column widths for a DataFrame: longest header/value + 6, capped at 60."""
+    widths = []
+    for col_idx, col_name in enumerate(df.columns):
+        values = df.iloc[:, col_idx].dropna()
+        max_length = len(str(col_name))
+        
+        if not values.empty:
+            if pd.api.types.is_datetime64_any_dtype(values):
+                # Every timestamp renders to the same length
+                value_length = len(str(values.iloc[0]))
+            else:
+                value_length = values.astype(str).str.len().max()
+            max_length = max(max_length, int(value_length))
         
-        # Configure styles
-        self.style = ttk.Style()
-        self.style.configure("Title.TLabel", font=("Segoe UI", 16, "bold"))
-        self.style.configure("Section.TLabel", font=("Segoe UI", 11, "bold"))
-        self.style.configure("Header.TLabel", font=("Segoe UI", 10, "bold"))
-        self.style.configure("Info.TLabel", font=("Segoe UI", 9))
-        self.style.configure("Success.TLabel", font=("Segoe UI", 9), foreground="green")
-        self.style.configure("Warning.TLabel", font=("Segoe UI", 9), foreground="orange")
-        self.style.configure("Error.TLabel", font=("Segoe UI", 9), foreground="red")
+        widths.append(min(max_length + 6, 60))
+    return widths
+
+
+def apply_column_widths(ws, widths):
+    """Set worksheet column widths from a column_widths() list."""
+    for col_idx, width in enumerate(widths, start=1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = width
+
+
+def read_workbook(filepath, columns=None, id_columns=(), engine='openpyxl'):
+    """Read the first sheet of a source workbook, parsing only `columns`."""
+    wanted = None if columns is None else set(columns)
+    return pd.read_excel(
+        filepath,
+        usecols=None if wanted is None else (lambda col: col in wanted),
+        dtype={col: object for col in id_columns},
+        engine=engine
+    )
+
+
+def write_formatted_workbook(filepath, sheets, currency_columns=(), date_columns=(), date_format='M/D/YYYY'):
+    """Write {sheet name: DataFrame} to a styled workbook in a single pass."""
+    wb = Workbook(write_only=True)
+    
+    for sheet_name, df in sheets.items():
+        ws = wb.create_sheet(title=sheet_name[:31])
+        columns = list(df.columns)
+        rows = df.astype(object).where(df.notna(), None).values.tolist()
+        
+        # Widths must be set before the first row in write-only mode
+        apply_column_widths(ws, column_widths(df))
+        
+        header = []
+        for col_name in columns:
+            cell = WriteOnlyCell(ws, value=col_name)
+            cell.fill = HEADER_FILL
+            cell.font = HEADER_FONT
+            cell.alignment = HEADER_ALIGNMENT
+            header.append(cell)
+        ws.append(header)
+        
+        formats = {}
+        for col_idx, col_name in enumerate(columns):
+            if col_name in currency_columns:
+                formats[col_idx] = CURRENCY_FORMAT
+            elif col_name in date_columns:
+                formats[col_idx] = date_format
+        
+        for row in rows:
+            for col_idx, number_format in formats.items():
+                cell = WriteOnlyCell(ws, value=row[col_idx])
+                cell.number_format = number_format
+                row[col_idx] = cell
+            ws.append(row)
+    
+    wb.save(filepath)
+
+
+# Bump when rep file layout/styling changes so unchanged reps are rewritten too
+REP_FILE_VERSION = 1
+
+# Batch manifest (_rep_manifest.db) columns, one row per rep file
+REP_MANIFEST_COLUMNS = ('sales_person_id', 'rep_name', 'file_name', 'row_count', 'payout',
+                        'content_hash', 'checksum', 'file_size')
+
+
+def render_rep_file(output_df):
+    """Render one rep's batch file to bytes, for attaching without touching disk."""
+    buffer = io.BytesIO()
+    write_formatted_workbook(
+        buffer, {'Incentive Data': output_df},
+        currency_columns=['Payout'], date_columns=['Start Date', 'End Date']
+    )
+    return buffer.getvalue()
+
+
+def write_rep_file(filepath, output_df):
+    """Write one rep's batch file (picklable for worker processes); returns (sha256, size)."""
+    data = render_rep_file(output_df)
+    Path(filepath).write_bytes(data)
+    return hashlib.sha256(data).hexdigest(), len(data)
+
+
+def write_manager_report(filepath, sheets):
+    """Write one management report workbook (picklable for worker processes)."""
+    columns = {str(col_name) for df in sheets.values() for col_name in df.columns}
+    write_formatted_workbook(
+        filepath, sheets,
+        currency_columns=[c for c in columns if 'payout' in c.lower()],
+        date_columns=[c for c in columns if 'start date' in c.lower() or 'end date' in c.lower()],
+        date_format='MM/DD/YYYY'
+    )
+    return filepath
+
+
+# ===== Email Directory =====
+
+class EmailDirectory:
+    """Local SQLite store of the email list, keyed on normalized SU01 Acct #."""
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self.conn = None
+    
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS directory ("
+                "acct_id TEXT PRIMARY KEY, email TEXT, name TEXT, record TEXT NOT NULL, source_hash TEXT)"
+            )
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.conn.close()
+    
+    def get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+    
+    def set_meta(self, key, value):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+    
+    def record_hash(self, record):
+        return hashlib.sha1(json.dumps(record, sort_keys=True).encode()).hexdigest()
+    
+    def text(self, value):
+        return None if value is None else str(value).strip()
+    
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM directory").fetchone()[0]
+    
+    def rows(self, ids=None):
+        """(acct_id, email, name) for every ID, or only the given IDs."""
+        if ids is None:
+            return self.conn.execute("SELECT acct_id, email, name FROM directory").fetchall()
+        
+        rows = []
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows += self.conn.execute(
+                f"SELECT acct_id, email, name FROM directory WHERE acct_id IN ({', '.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+        return rows
+    
+    def frame(self):
+        """The whole directory as a DataFrame, columns in first-seen order."""
+        records = [json.loads(record) for (record,) in self.conn.execute("SELECT record FROM directory ORDER BY rowid")]
+        return pd.DataFrame.from_records(records, columns=self.get_meta('columns', []))
+    
+    def upsert(self, df, from_source=False):
+        """Insert new and update changed rows keyed on 'SU01 Acct #'; returns (inserted, updated, removed)."""
+        df = df[df['SU01 Acct #'].notna()].drop_duplicates(subset=['SU01 Acct #'], keep='first')
+        columns = [str(col) for col in df.columns]
+        
+        incoming = {}
+        for row in df.astype(object).where(df.notna(), None).values.tolist():
+            # JSON round trip so values compare equal to stored ones
+            record = json.loads(json.dumps(dict(zip(columns, row)), default=str))
+            incoming[record['SU01 Acct #']] = record
+        
+        existing = {}
+        ids = list(incoming)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            for acct_id, record, source_hash in self.conn.execute(
+                f"SELECT acct_id, record, source_hash FROM directory WHERE acct_id IN ({', '.join('?' * len(chunk))})",
+                chunk
+            ):
+                existing[acct_id] = (json.loads(record), source_hash)
+        
+        inserted = []
+        updated = []
+        writes = []
+        for acct_id, record in incoming.items():
+            source_hash = self.record_hash(record) if from_source else None
+            if acct_id in existing:
+                old, old_source_hash = existing[acct_id]
+                if from_source and source_hash == old_source_hash:
+                    continue
+                if not from_source:
+                    # A blank cell in a sync extract never replaces a stored value
+                    record = {col: value for col, value in record.items() if self.text(value)}
+                merged = {**old, **record}
+                if merged != old:
+                    updated.append(acct_id)
+                elif not from_source:
+                    continue
+                record = merged
+                source_hash = source_hash or old_source_hash
+            else:
+                inserted.append(acct_id)
+            writes.append((
+                acct_id, self.text(record.get('SU01 Email')), self.text(record.get('SU01 Name')),
+                json.dumps(record), source_hash
+            ))
+        
+        # Rows that were in the workbook before (synced rows not yet exported never were)
+        removed = []
+        if from_source:
+            removed = [
+                acct_id for (acct_id,) in self.conn.execute("SELECT acct_id FROM directory WHERE source_hash IS NOT NULL")
+                if acct_id not in incoming
+            ]
         
+        known_columns = self.get_meta('columns', [])
+        new_columns = [col for col in columns if col not in known_columns]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO directory (acct_id, email, name, record, source_hash) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(acct_id) DO UPDATE SET email = excluded.email, name = excluded.name, "
+                "record = excluded.record, source_hash = excluded.source_hash",
+                writes
+            )
+            self.conn.executemany("DELETE FROM directory WHERE acct_id = ?", [(acct_id,) for acct_id in removed])
+            if new_columns:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('columns', ?)",
+                    (json.dumps(known_columns + new_columns),)
+                )
+        return inserted, updated, removed
+    
+    def mark_exported(self):
+        """Record every row as written to the Excel file."""
+        rows = self.conn.execute("SELECT acct_id, record FROM directory").fetchall()
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE directory SET source_hash = ? WHERE acct_id = ?",
+                [(self.record_hash(json.loads(record)), acct_id) for acct_id, record in rows]
+            )
+
+
+# ===== Mail Transports =====
+# Messages are plain dicts: {'to': [...], 'cc': [...], 'subject': str,
+# 'body': str, 'html': str or None, 'attachments': [...]}. An attachment is
+# a Path on disk or an in-memory (filename, bytes) pair.
+MAIL_BACKENDS = {'outlook': 'Outlook', 'smtp': 'SMTP', 'file': 'Save .eml files'}
+
+
+def build_mime_message(sender, message):
+    """Render a message dict as an EmailMessage (SMTP and .eml backends)."""
+    mime = EmailMessage()
+    mime['From'] = sender
+    mime['To'] = ", ".join(message['to'])
+    if message.get('cc'):
+        mime['Cc'] = ", ".join(message['cc'])
+    mime['Subject'] = message['subject']
+    mime['Date'] = formatdate(localtime=True)
+    mime['Message-ID'] = make_msgid()
+    
+    if message.get('html') and not message.get('body'):
+        mime.set_content(message['html'], subtype='html')
+    else:
+        mime.set_content(message.get('body') or '')
+        if message.get('html'):
+            mime.add_alternative(message['html'], subtype='html')
+    
+    for attachment in message.get('attachments', []):
+        if isinstance(attachment, tuple):
+            filename, data = attachment
+        else:
+            filename, data = Path(attachment).name, Path(attachment).read_bytes()
+        content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        maintype, subtype = content_type.split('/', 1)
+        mime.add_attachment(data, maintype=maintype, subtype=subtype, filename=filename)
+    return mime
+
+
+def is_transient_send_error(error):
+    """True for failures worth retrying: relay throttling (4xx) and dropped connections."""
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    return isinstance(error, (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError))
+
+
+class TokenBucket:
+    """Token-bucket rate limiter shared by the send workers."""
+    
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self, cancel_event=None):
+        """Block until a token is free. Returns False if cancelled while waiting."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            
+            if cancel_event is not None and cancel_event.wait(wait):
+                return False
+            if cancel_event is None:
+                time.sleep(wait)
+
+
+class MailTransport:
+    """Base mail backend; use as a context manager around a run of sends."""
+    
+    # Whether send() may be called from several threads at once
+    concurrent = True
+    
+    def __init__(self, sender):
+        self.sender = sender
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def close(self):
+        pass
+    
+    def send(self, message):
+        raise NotImplementedError
+
+
+class OutlookTransport(MailTransport):
+    """Sends through the local Outlook client over COM (one thread at a time)."""
+    
+    concurrent = False
+    
+    def __enter__(self):
+        # COM is initialized per thread, so this works from the job thread too
+        pythoncom.CoInitialize()
+        try:
+            self.outlook = win32.Dispatch('Outlook.Application')
+        except Exception:
+            pythoncom.CoUninitialize()
+            raise
+        return self
+    
+    def close(self):
+        self.outlook = None
+        pythoncom.CoUninitialize()
+    
+    def send(self, message):
+        mail = self.outlook.CreateItem(0)
+        mail.SentOnBehalfOfName = self.sender
+        mail.To = "; ".join(message['to'])
+        if message.get('cc'):
+            mail.CC = "; ".join(message['cc'])
+        mail.Subject = message['subject']
+        
+        if message.get('html'):
+            mail.Body = ""  # Clear plain text body
+            mail.HTMLBody = message['html']
+        else:
+            mail.Body = message['body']
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for attachment in message.get('attachments', []):
+                if isinstance(attachment, tuple):
+                    # Outlook only attaches from disk; stage in local temp, not the synced folder
+                    filename, data = attachment
+                    attachment = Path(temp_dir) / filename
+                    attachment.write_bytes(data)
+                mail.Attachments.Add(str(attachment))
+            mail.Send()
+
+
+class SmtpTransport(MailTransport):
+    """Sends over SMTP, reusing a pool of logged-in connections across messages."""
+    
+    def __init__(self, sender, host, port=587, username=None, password=None,
+                 starttls=True, pool_size=4, timeout=60):
+        super().__init__(sender)
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.idle = queue.LifoQueue(maxsize=pool_size)
+    
+    def connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls(context=ssl.create_default_context())
+            if self.username:
+                smtp.login(self.username, self.password or '')
+        except Exception:
+            smtp.close()
+            raise
+        return smtp
+    
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            return self.connect()
+    
+    def release(self, smtp):
+        try:
+            self.idle.put_nowait(smtp)
+        except queue.Full:
+            self.discard(smtp)
+    
+    def discard(self, smtp):
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+    
+    def close(self):
+        while True:
+            try:
+                self.discard(self.idle.get_nowait())
+            except queue.Empty:
+                break
+    
+    def send(self, message):
+        mime = build_mime_message(self.sender, message)
+        smtp = self.acquire()
+        try:
+            try:
+                smtp.send_message(mime)
+            except smtplib.SMTPServerDisconnected:
+                # A pooled connection can time out while idle; retry once on a fresh one
+                smtp.close()
+                smtp = self.connect()
+                smtp.send_message(mime)
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException):
+            # The server answered, so the connection is still usable
+            self.release(smtp)
+            raise
+        except OSError:
+            self.discard(smtp)
+            raise
+        self.release(smtp)
+
+
+class FileTransport(MailTransport):
+    """Writes each message to an .eml file instead of sending (local testing)."""
+    
+    def __init__(self, sender, folder):
+        super().__init__(sender)
+        self.folder = Path(folder)
+        self.lock = threading.Lock()
+        self.count = 0
+    
+    def __enter__(self):
+        self.folder.mkdir(parents=True, exist_ok=True)
+        return self
+    
+    def send(self, message):
+        mime = build_mime_message(self.sender, message)
+        with self.lock:
+            self.count += 1
+            number = self.count
+        recipient = re.sub(r'[^\w.@-]', '_', "_".join(message['to']))[:80]
+        filepath = self.folder / f"{datetime.now():%Y%m%d-%H%M%S}_{number:05d}_{recipient}.eml"
+        filepath.write_bytes(mime.as_bytes())
+
+
+class SendJournal:
+    """Append-only log of send outcomes for one batch folder (_send_journal.db)."""
+    
+    FILENAME = "_send_journal.db"
+    
+    def __init__(self, folder):
+        self.path = Path(folder) / self.FILENAME
+        self.conn = None
+    
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        # Rollback journal, not WAL: the batch folder is OneDrive-synced and
+        # -wal/-shm sidecars would sync on their own (converts older journals)
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS send_events ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, recipient_id TEXT NOT NULL, "
+                "status TEXT NOT NULL, name TEXT, email TEXT, detail TEXT, error TEXT, logged_at TEXT NOT NULL)"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS send_events_recipient ON send_events (kind, recipient_id, seq)"
+            )
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.conn.close()
+    
+    def log(self, kind, events):
+        """Append (recipient_id, status, name, email, detail, error) events."""
+        logged_at = datetime.now().isoformat(timespec='seconds')
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO send_events (kind, recipient_id, status, name, email, detail, error, logged_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(kind, *event, logged_at) for event in events]
+            )
+    
+    def latest(self, kind):
+        """{recipient_id: event dict} holding each recipient's most recent event."""
+        rows = self.conn.execute(
+            "SELECT recipient_id, status, name, email, detail, error, logged_at FROM send_events "
+            "WHERE seq IN (SELECT MAX(seq) FROM send_events WHERE kind = ? GROUP BY recipient_id) "
+            "ORDER BY seq",
+            (kind,)
+        ).fetchall()
+        return {
+            row[0]: dict(zip(('status', 'name', 'email', 'detail', 'error', 'logged_at'), row[1:]))
+            for row in rows
+        }
+
+
+class JobCancelled(Exception):
+    """Raised inside a background job once the user has asked it to stop."""
+
+
+class BackgroundJob:
+    """Progress and cancellation handle for a stage running on the job thread."""
+    
+    PROGRESS_INTERVAL = 0.1  # Seconds between progress redraws
+    
+    def __init__(self, post_to_ui):
+        self.post_to_ui = post_to_ui
+        self.cancel_event = threading.Event()
+        self.last_progress = 0.0
+    
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+    
+    def cancel(self):
+        self.cancel_event.set()
+    
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+    
+    def progress(self, callback, *args):
+        """Post a progress callback unless one went out very recently."""
+        now = time.monotonic()
+        if now - self.last_progress >= self.PROGRESS_INTERVAL:
+            self.last_progress = now
+            self.post_to_ui(callback, *args)
+
+
+class IncentiveBatchEngine:
+    """Headless incentive pipeline: load sources, split, assess, report, send."""
+    
+    def __init__(self):
         # ===== File Paths =====
         self.source_path = Path(
             r"C:\Users\jmperry\Breakthru Beverage Group\BBG CA - TD Analysts - Documents"
@@ -60,6 +716,17 @@ class IncentiveBatchManager:
             r"C:\Users\jmperry\Breakthru Beverage Group\BBG CA - TD Analysts - Documents"
             r"\Form Site\CA_Sales Detail.xlsx"
         )
+        # Local (non-synced) cache of the parsed Master Incentive Log
+        self.cache_dir = Path(tempfile.gettempdir()) / "Incentive Batch Manager Cache"
+        # Local email directories, one per email list; EmailList.xlsx is imported
+        # into its directory and exported on request. Set email_directory_path
+        # to use a specific database instead.
+        self.email_directory_folder = (
+            Path(os.environ.get("LOCALAPPDATA") or tempfile.gettempdir()) / "Incentive Batch Manager"
+        )
+        self.email_directory_path = None
+        # Workbook parser for the source files
+        self.excel_engine = 'calamine' if CALAMINE_AVAILABLE else 'openpyxl'
         
         # Output columns for batch files
         self.output_columns = [
@@ -77,10 +744,32 @@ class IncentiveBatchManager:
             "CAAnalyticsAll@breakthrubev.com"
         ]
         
+        # Mail backend: 'outlook', 'smtp' (pooled connections) or 'file' (.eml for testing)
+        self.mail_backend = 'outlook'
+        self.smtp_host = os.environ.get("INCENTIVE_SMTP_HOST", "")
+        self.smtp_port = int(os.environ.get("INCENTIVE_SMTP_PORT", "587"))
+        self.smtp_username = os.environ.get("INCENTIVE_SMTP_USER")
+        self.smtp_password = os.environ.get("INCENTIVE_SMTP_PASSWORD")
+        self.smtp_starttls = True
+        self.eml_folder = None  # Defaults to <output base>/Outbox
+        
+        # Send scheduling: parallel sends, relay rate limit (messages/sec, None = unlimited)
+        # and retries with exponential backoff for throttling/dropped connections
+        self.send_concurrency = 4
+        self.send_rate = 5.0
+        self.send_burst = 5
+        self.send_retries = 4
+        self.send_backoff = 2.0
+        
         # ===== Data Storage =====
         self.master_df = None
-        self.email_df = None
+        self.email_index = {}  # SU01 Acct # -> email/name/valid, updated in place by syncs
         self.hierarchy_df = None  # Phase 3: CA_Sales_Detail
+        self.hierarchy_index = {}  # level -> managers, subtree rows and rep IDs
+        self.batch_index = {}  # year -> Paid On Batch -> master_df row positions
+        self.batch_cube = {}  # record/payout aggregates by year, batch, rep, supplier, channel
+        self.loaded_stamps = {}  # source name -> (size, mtime_ns) of the workbook last loaded
+        self.batch_frame_cache = {}  # (year, batch) -> filtered master_df
         self.batch_files = []
         self.email_mapping = {}
         self.missing_emails = []
@@ -90,93 +779,1758 @@ class IncentiveBatchManager:
         
         # Phase 3: Management reporting
         self.mgmt_reports = []
+        self.mgmt_report_errors = []
         self.mgmt_email_mapping = {}
         self.mgmt_missing_emails = []
         self.mgmt_output_folder = None
         
-        # Build UI
-        self.create_widgets()
-        
-        # Load data on startup
-        self.root.after(100, self.initial_load)
+        # Shared worker processes for CPU-bound parsing and workbook writing
+        self.process_pool = None
     
-    def create_widgets(self):
-        """Create all UI widgets."""
-        # Create scrollable canvas
-        canvas = tk.Canvas(self.root)
-        scrollbar = ttk.Scrollbar(self.root, orient="vertical", command=canvas.yview)
-        self.scrollable_frame = ttk.Frame(canvas, padding="15")
+    def on_progress(self, stage, value, maximum, text):
+        """Progress hook for a running stage; the GUI draws it, headless runs ignore it."""
+    
+    def warn(self, title, message):
+        """Report a non-fatal problem (the GUI shows a message box)."""
+        print(f"{title}: {message}")
+    
+    # ==========================================
+    # DATA LOADING
+    # ==========================================
+    
+    def normalize_ids(self, series):
+        """Clean an ID column: 12345, 12345.0 and ' 12345.0' all become '12345'; blanks become None."""
+        present = series.notna().to_numpy()
+        values = series[present]
         
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
+        if pd.api.types.is_bool_dtype(values):
+            numbers = np.full(len(values), np.nan)
+        else:
+            numbers = pd.to_numeric(values, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
         
-        canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
+        # Integral-valued IDs are truncated like int(float(s)); the rest stay text
+        is_int = np.isfinite(numbers) & (np.abs(numbers) < 2 ** 63)
+        keys = np.empty(len(values), dtype=object)
+        keys[is_int] = np.trunc(numbers[is_int]).astype(np.int64).astype(str).tolist()
+        keys[~is_int] = values[~is_int].astype(str).str.strip().str.removesuffix('.0').tolist()
         
-        # Enable mousewheel scrolling
-        def _on_mousewheel(event):
-            canvas.yview_scroll(int(-1*(event.delta/120)), "units")
-        canvas.bind_all("<MouseWheel>", _on_mousewheel)
+        result = np.full(len(series), None, dtype=object)
+        result[present] = keys
+        return pd.Series(result, index=series.index, name=series.name, dtype=object)
+    
+    def get_process_pool(self):
+        """Return the shared worker process pool, creating it on first use."""
+        if self.process_pool is None:
+            try:
+                self.process_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+            except (OSError, NotImplementedError):
+                return None
+        return self.process_pool
+    
+    def read_excel(self, filepath, columns=None, id_columns=()):
+        """read_workbook() in a worker process, falling back to this thread."""
+        pool = self.process_pool
+        if pool is not None:
+            try:
+                return pool.submit(
+                    read_workbook, str(filepath), columns, id_columns, self.excel_engine
+                ).result()
+            except BrokenProcessPool:
+                self.process_pool = None
+        return read_workbook(filepath, columns, id_columns, self.excel_engine)
+    
+    def shutdown_workers(self):
+        """Stop the worker processes."""
+        if self.process_pool is not None:
+            self.process_pool.shutdown(cancel_futures=True)
+            self.process_pool = None
+    
+    def load_sources(self, master=True, email=False, hierarchy=False):
+        """Read the requested source files synchronously (headless runs)."""
+        stamps = self.source_stamps()
+        if master:
+            self.master_df, self.batch_index, self.batch_cube, _ = self.read_master_data()
+            self.batch_frame_cache = {}
+            self.loaded_stamps['master'] = stamps['master']
+        if email:
+            self.email_index = self.read_email_list()
+            self.loaded_stamps['email'] = stamps['email']
+        if hierarchy:
+            self.hierarchy_df, self.hierarchy_index = self.read_hierarchy_data()
+            self.loaded_stamps['hierarchy'] = stamps['hierarchy']
+    
+    def source_stamps(self):
+        """{'master'/'email'/'hierarchy': (size, mtime_ns)} of each source workbook, None if missing."""
+        stamps = {}
+        for name, path in [('master', self.source_path), ('email', self.email_list_path),
+                           ('hierarchy', self.hierarchy_path)]:
+            try:
+                stat = path.stat()
+                stamps[name] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                stamps[name] = None
+        return stamps
+    
+    def changed_sources(self):
+        """Stamps of the source workbooks that changed since they were last loaded."""
+        return {name: stamp for name, stamp in self.source_stamps().items() if stamp != self.loaded_stamps.get(name)}
+    
+    def read_master_data(self):
+        """Read the Master Incentive Log; returns (master_df, batch_index, batch_cube, from_cache)."""
+        if not self.source_path.exists():
+            raise FileNotFoundError("Master file not found")
         
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+        # Create temp copy to avoid file lock
+        temp_dir = tempfile.gettempdir()
+        temp_file = Path(temp_dir) / "temp_master_incentive_log.xlsx"
+        from_cache = False
         
-        main_frame = self.scrollable_frame
+        source_stat = self.source_path.stat()
+        master_df = self.read_master_cache(source_stat)
         
-        # ===== Title =====
-        ttk.Label(
-            main_frame, 
-            text="Incentive Batch Manager",
-            style="Title.TLabel"
-        ).pack(pady=(0, 5))
+        if master_df is not None:
+            from_cache = True
+        else:
+            shutil.copy2(self.source_path, temp_file)
+            master_df = self.apply_master_schema(self.read_excel(temp_file, columns=self.output_columns))
+            self.write_master_cache(master_df, temp_file, source_stat)
+            temp_file.unlink()
         
-        ttk.Label(
-            main_frame,
-            text="Split & Email Distribution Tool",
-            style="Info.TLabel"
-        ).pack(pady=(0, 15))
+        # Index rows by year/batch once for filters; combos and previews read the cube
+        batch_index = self.build_batch_index(master_df)
+        batch_cube = self.build_batch_cube(master_df)
         
-        # ========================================
-        # STAGE 1: BATCH SPLITTING
-        # ========================================
-        stage1_frame = ttk.LabelFrame(main_frame, text="STAGE 1: Create Batch Files", padding="10")
-        stage1_frame.pack(fill=tk.X, pady=(0, 15))
+        return master_df, batch_index, batch_cube, from_cache
+    
+    def apply_master_schema(self, master_df):
+        """Convert master columns to their MASTER_SCHEMA types."""
+        for col, kind in MASTER_SCHEMA.items():
+            if col not in master_df.columns:
+                continue
+            values = master_df[col]
+            present = values.notna()
+            
+            if kind == 'category':
+                master_df[col] = values.astype('category')
+                continue
+            
+            if kind == 'date':
+                if pd.api.types.is_datetime64_any_dtype(values):
+                    continue
+                converted = pd.to_datetime(values, errors='coerce')
+            elif pd.api.types.is_bool_dtype(values):
+                continue
+            else:
+                converted = pd.to_numeric(values, errors='coerce')
+            
+            if (converted.notna() != present).any():
+                continue
+            
+            if kind == 'id':
+                if (converted[present] % 1 != 0).any():
+                    continue
+                converted = converted.astype('int64' if present.all() else 'Int64')
+            elif kind == 'money':
+                converted = converted.astype('float64')
+            master_df[col] = converted
         
-        # --- Status ---
-        status_frame = ttk.Frame(stage1_frame)
-        status_frame.pack(fill=tk.X, pady=(0, 10))
+        return master_df
+    
+    def batch_year_key(self, value):
+        """Display/lookup key for a Batch Year value (2025.0 -> '2025')."""
+        return str(int(value)) if isinstance(value, float) else str(value)
+    
+    def batch_keys(self, master_df):
+        """Per-row year and Paid On Batch lookup keys (NaN where blank)."""
+        years = master_df['Batch Year']
+        batches = master_df['Paid On Batch']
+        
+        # Convert each distinct value to its key once rather than every row
+        year_keys = years.map({y: self.batch_year_key(y) for y in years.dropna().unique()})
+        batch_keys = batches.map({b: str(b) for b in batches.dropna().unique()})
+        return year_keys, batch_keys
+    
+    def build_batch_index(self, master_df):
+        """Build the year -> Paid On Batch -> row positions partition index."""
+        batch_index = {}
+        year_keys, batch_keys = self.batch_keys(master_df)
         
-        ttk.Label(status_frame, text="Data Status:", style="Header.TLabel").pack(anchor=tk.W)
-        self.data_status = ttk.Label(
-            status_frame,
-            text="Loading...",
-            style="Info.TLabel"
-        )
-        self.data_status.pack(anchor=tk.W)
+        for year_key in year_keys.dropna().unique():
+            batch_index[year_key] = {}
         
-        # --- Batch Selection ---
-        selection_frame = ttk.LabelFrame(stage1_frame, text="Batch Selection", padding="10")
-        selection_frame.pack(fill=tk.X, pady=(5, 10))
+        partitions = pd.DataFrame({'year': year_keys, 'batch': batch_keys}).groupby(
+            ['year', 'batch'], sort=False, observed=True
+        ).indices
         
-        # Batch Year
-        year_frame = ttk.Frame(selection_frame)
-        year_frame.pack(fill=tk.X, pady=(0, 8))
+        for (year_key, batch_key), positions in partitions.items():
+            batch_index[year_key][batch_key] = positions
         
-        ttk.Label(year_frame, text="Batch Year:", width=15, style="Header.TLabel").pack(side=tk.LEFT)
-        self.year_var = tk.StringVar()
-        self.year_combo = ttk.Combobox(
-            year_frame, 
-            textvariable=self.year_var, 
-            state="readonly",
-            width=25
+        return batch_index
+    
+    def build_batch_cube(self, master_df):
+        """Aggregate the log once per load for previews and batch lists."""
+        year_keys, batch_keys = self.batch_keys(master_df)
+        keyed = (year_keys.notna() & batch_keys.notna()).to_numpy()
+        
+        frame = pd.DataFrame({
+            'year': year_keys.astype(object),
+            'batch': batch_keys.astype(object),
+            'SalesPersonID': master_df['SalesPersonID'],
+            'payout': pd.to_numeric(master_df['Payout'], errors='coerce') if 'Payout' in master_df.columns else 0.0
+        })
+        for col in ['Supplier', 'Channel']:
+            if col in master_df.columns:
+                frame[col] = master_df[col].astype(object).fillna('')
+            else:
+                frame[col] = ''
+        
+        cells = frame[keyed].groupby(['year', 'batch'] + BATCH_CUBE_COLUMNS, dropna=False).agg(
+            rows=('payout', 'size'), payout=('payout', 'sum')
         )
-        self.year_combo.pack(side=tk.LEFT, padx=(10, 0))
-        self.year_combo.bind("<<ComboboxSelected>>", self.on_year_selected)
         
-        # Paid On Batch
-        batch_frame = ttk.Frame(selection_frame)
+        batches = {year_key: {} for year_key in year_keys.dropna().unique()}
+        totals = cells.reset_index().groupby(['year', 'batch']).agg(
+            rows=('rows', 'sum'), reps=('SalesPersonID', 'nunique'), payout=('payout', 'sum')
+        )
+        for (year_key, batch_key), rows, reps, payout in totals.itertuples(name=None):
+            batches[year_key][batch_key] = {'rows': int(rows), 'reps': int(reps), 'payout': float(payout)}
+        
+        return {'cells': cells, 'batches': batches}
+    
+    def batch_summary(self, year, batch):
+        """Record count, unique reps and payout for a batch, or None if it has no rows."""
+        return self.batch_cube.get('batches', {}).get(year, {}).get(batch)
+    
+    def batch_breakdown(self, year, batch, by):
+        """A batch's records and payout per value of one BATCH_CUBE_COLUMNS column."""
+        if self.batch_summary(year, batch) is None:
+            return pd.DataFrame(columns=['rows', 'payout'])
+        cells = self.batch_cube['cells'].loc[(year, batch)]
+        return cells.groupby(level=by, dropna=False).sum().sort_values('payout', ascending=False)
+    
+    def file_sha256(self, filepath):
+        """Return the SHA-256 hex digest of a file's contents."""
+        digest = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def read_master_cache(self, source_stat):
+        """Return the cached Master Incentive Log, or None if missing/stale."""
+        meta_path = self.cache_dir / "master_log.json"
+        
+        try:
+            meta = json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            return None
+        
+        cache_path = self.cache_dir / meta.get('file', '')
+        if meta.get('version') != MASTER_CACHE_VERSION or not cache_path.is_file():
+            return None
+        
+        # The cache only holds the columns that were read, parsed by one engine
+        if meta.get('columns') != list(self.output_columns) or meta.get('engine') != self.excel_engine:
+            return None
+        
+        if meta.get('size') != source_stat.st_size:
+            return None
+        
+        if meta.get('mtime_ns') != source_stat.st_mtime_ns:
+            if meta.get('sha256') != self.file_sha256(self.source_path):
+                return None
+            meta['mtime_ns'] = source_stat.st_mtime_ns
+            meta_path.write_text(json.dumps(meta))
+        
+        try:
+            if meta.get('format') == 'parquet':
+                return pd.read_parquet(cache_path)
+            return pd.read_pickle(cache_path)
+        except Exception:
+            return None
+    
+    def write_master_cache(self, df, content_path, source_stat):
+        """Write the parsed Master Incentive Log to the local cache."""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            meta_path = self.cache_dir / "master_log.json"
+            
+            # Parquet is preferred; mixed-type object columns (common in hand-
+            # edited logs) cannot be stored as Parquet, so fall back to pickle
+            cache_format = None
+            if PARQUET_AVAILABLE:
+                cache_path = self.cache_dir / "master_log.parquet"
+                tmp_path = cache_path.with_suffix('.tmp')
+                try:
+                    df.to_parquet(tmp_path, index=False)
+                    cache_format = 'parquet'
+                except Exception:
+                    pass
+            
+            if cache_format is None:
+                cache_path = self.cache_dir / "master_log.pkl"
+                tmp_path = cache_path.with_suffix('.tmp')
+                df.to_pickle(tmp_path)
+                cache_format = 'pickle'
+            
+            os.replace(tmp_path, cache_path)
+            
+            meta = {
+                'version': MASTER_CACHE_VERSION,
+                'format': cache_format,
+                'file': cache_path.name,
+                'columns': list(self.output_columns),
+                'engine': self.excel_engine,
+                'size': source_stat.st_size,
+                'mtime_ns': source_stat.st_mtime_ns,
+                'sha256': self.file_sha256(content_path)
+            }
+            meta_path.write_text(json.dumps(meta))
+            
+        except Exception as e:
+            # A missing cache only costs load time; never block the load
+            print(f"Error writing master cache: {e}")
+    
+    def email_directory_file(self):
+        """The email directory database for the current email list."""
+        if self.email_directory_path is not None:
+            return self.email_directory_path
+        list_key = hashlib.sha1(os.path.normcase(str(self.email_list_path.resolve())).encode()).hexdigest()[:12]
+        return self.email_directory_folder / f"email_directory_{list_key}.db"
+    
+    def read_email_source(self, filepath, columns=None):
+        """Read an EmailList/ZREPCHECKNEW workbook with its ID columns normalized."""
+        email_df = self.read_excel(filepath, columns=columns, id_columns=EMAIL_ID_COLUMNS)
+        
+        # Clean ID columns (remove .0 decimals)
+        for col in EMAIL_ID_COLUMNS:
+            if col in email_df.columns:
+                email_df[col] = self.normalize_ids(email_df[col])
+        
+        if 'SU01 Acct #' not in email_df.columns:
+            raise ValueError(f"{Path(filepath).name} has no 'SU01 Acct #' column")
+        return email_df
+    
+    def read_email_list(self):
+        """Load the email directory (on a load thread in the GUI)."""
+        with EmailDirectory(self.email_directory_file()) as directory:
+            if self.email_list_path.exists():
+                stat = self.email_list_path.stat()
+                source_stat = [stat.st_size, stat.st_mtime]
+                if directory.get_meta('source_stat') != source_stat:
+                    directory.upsert(self.read_email_source(self.email_list_path), from_source=True)
+                    directory.set_meta('source_stat', source_stat)
+            elif not directory.count():
+                raise FileNotFoundError("Email list not found")
+            
+            return {acct_id: self.email_index_entry(email, name) for acct_id, email, name in directory.rows()}
+    
+    def email_index_entry(self, email, name):
+        """Lookup entry for one directory row."""
+        email = email or ''
+        name = name or ''
+        return {
+            'email': email if email and email != 'nan' else None,
+            'name': name if name and name != 'nan' else 'Unknown',
+            'valid': '@' in email
+        }
+    
+    def sync_email_directory(self, zrep_path):
+        """Upsert a ZREPCHECKNEW extract into the email directory; returns (inserted, updated)."""
+        with EmailDirectory(self.email_directory_file()) as directory:
+            zrep_df = self.read_email_source(zrep_path, directory.get_meta('columns') or EMAIL_COLUMNS)
+            inserted, updated, _ = directory.upsert(zrep_df)
+            changed = inserted + updated
+            if changed:
+                directory.set_meta('pending_export', directory.get_meta('pending_export', 0) + len(changed))
+                for acct_id, email, name in directory.rows(changed):
+                    self.email_index[acct_id] = self.email_index_entry(email, name)
+        return inserted, updated
+    
+    def pending_email_export(self):
+        """Number of synced changes not yet exported to EmailList.xlsx."""
+        with EmailDirectory(self.email_directory_file()) as directory:
+            return directory.get_meta('pending_export', 0)
+    
+    def export_email_list(self):
+        """Write the whole directory back to EmailList.xlsx. Returns the row count."""
+        with EmailDirectory(self.email_directory_file()) as directory:
+            email_df = directory.frame()
+            email_df.to_excel(self.email_list_path, index=False)
+            
+            stat = self.email_list_path.stat()
+            directory.mark_exported()
+            directory.set_meta('source_stat', [stat.st_size, stat.st_mtime])
+            directory.set_meta('pending_export', 0)
+        
+        # The index already matches what was written; don't reload it
+        self.loaded_stamps['email'] = (stat.st_size, stat.st_mtime_ns)
+        return len(email_df)
+    
+    def read_hierarchy_data(self):
+        """Read the CA_Sales_Detail hierarchy file (on a load thread in the GUI)."""
+        if not self.hierarchy_path.exists():
+            raise FileNotFoundError("Hierarchy file not found")
+        
+        hierarchy_df = self.read_excel(
+            self.hierarchy_path, columns=HIERARCHY_COLUMNS,
+            id_columns=HIERARCHY_ID_COLUMNS + ['Division Manager Position ID']
+        )
+        
+        # Clean all ID columns
+        for col in HIERARCHY_ID_COLUMNS:
+            if col in hierarchy_df.columns:
+                hierarchy_df[col] = self.normalize_ids(hierarchy_df[col])
+        
+        # Filter to valid Division Manager Position IDs
+        valid_dm_positions = ['40064102', '40064095', '40064096', '40064098', '40064471', '40064097', '40070873']
+        hierarchy_df['Division Manager Position ID'] = hierarchy_df['Division Manager Position ID'].astype(str).str.strip()
+        hierarchy_df = hierarchy_df[
+            hierarchy_df['Division Manager Position ID'].isin(valid_dm_positions)
+        ].copy()
+        
+        # Filter out unassigned FSMs
+        hierarchy_df = hierarchy_df[
+            hierarchy_df['Field Sales Manager ID'].notna()
+        ].copy()
+        
+        return hierarchy_df, self.build_hierarchy_index(hierarchy_df)
+    
+    def build_hierarchy_index(self, hierarchy_df):
+        """Index every manager's hierarchy rows and Sales Person IDs, per level, once per load."""
+        hierarchy_index = {}
+        rep_ids = hierarchy_df['Sales Person ID'].to_numpy()
+        
+        for level_code, id_col, name_col in MANAGER_LEVELS:
+            managers = [
+                (mgr_id, mgr_name)
+                for mgr_id, mgr_name in hierarchy_df[[id_col, name_col]].drop_duplicates().itertuples(index=False)
+                if not (pd.isna(mgr_id) or mgr_id in ['UNASSIGNED', None])
+            ]
+            rows = hierarchy_df.groupby(id_col, sort=False).indices
+            reps = {
+                mgr_id: frozenset(rep_id for rep_id in rep_ids[positions] if not pd.isna(rep_id))
+                for mgr_id, positions in rows.items()
+            }
+            hierarchy_index[level_code] = {'managers': managers, 'rows': rows, 'reps': reps}
+        
+        return hierarchy_index
+    
+    # ==========================================
+    # STAGE 1: BATCH SPLITTING
+    # ==========================================
+    
+    def filter_master_data(self, year, batch):
+        """Filter master dataframe by year and batch."""
+        key = (year, batch)
+        if key not in self.batch_frame_cache:
+            positions = self.batch_index.get(year, {}).get(batch)
+            if positions is None:
+                return self.master_df.iloc[0:0]
+            self.batch_frame_cache[key] = self.master_df.iloc[positions]
+        return self.batch_frame_cache[key]
+    
+    def batch_folder(self, year, batch):
+        """Output folder for a batch: <output base>/<year>/<batch>_<year>."""
+        batch_folder_name = f"{batch}_{year}".replace("/", "-").replace("\\", "-")
+        return self.output_base / str(year).split('.')[0] / batch_folder_name
+    
+    def plan_rep_files(self, year, batch, filtered_df):
+        """Split a batch into (normalized SalesPersonID, rep name, filename, output_df), one per rep."""
+        available_columns = [col for col in self.output_columns if col in filtered_df.columns]
+        batch_clean = str(batch).replace("/", "-").replace("\\", "-").replace(":", "-")
+        year_clean = str(year).split('.')[0]
+        
+        # Manifest and email keys use the same normalized IDs as the email index
+        groups = list(filtered_df.groupby('SalesPersonID'))
+        rep_ids = self.normalize_ids(pd.Series([sales_person_id for sales_person_id, _ in groups], dtype=object))
+        
+        plan = []
+        for rep_id, (sales_person_id, group_df) in zip(rep_ids, groups):
+            rep_name = group_df['Rep Name'].iloc[0] if 'Rep Name' in group_df.columns else "Unknown"
+            rep_name_clean = str(rep_name).replace("/", "-").replace("\\", "-").replace(":", "-")
+            
+            filename = f"{sales_person_id}_{rep_name_clean}_{batch_clean}_{year_clean}.xlsx"
+            plan.append((rep_id, rep_name, filename, group_df[available_columns].copy()))
+        return plan
+    
+    def split_batch(self, job, year, batch, filtered_df, parallel):
+        """Write the per-rep files and the batch manifest (runs on the job thread)."""
+        # Create folder structure: year / batch / Individual Emails
+        individual_folder = self.batch_folder(year, batch) / "Individual Emails"
+        
+        individual_folder.mkdir(parents=True, exist_ok=True)
+        
+        # Only reps whose slice of the batch changed are rewritten
+        previous_manifest = self.read_rep_manifest(individual_folder)
+        manifest = {}
+        
+        available_columns = [col for col in self.output_columns if col in filtered_df.columns]
+        
+        files_created = 0
+        rep_files = []
+        unchanged = 0
+        
+        # Hash every row of the batch once; each rep hashes its slice of these
+        row_hashes = pd.util.hash_pandas_object(filtered_df[available_columns], index=False)
+        
+        for sales_person_id, rep_name, filename, output_df in self.plan_rep_files(year, batch, filtered_df):
+            filepath = individual_folder / filename
+            entry = {
+                'sales_person_id': sales_person_id,
+                'rep_name': str(rep_name),
+                'file_name': filename,
+                'row_count': len(output_df),
+                'payout': self.rep_payout(output_df),
+                'content_hash': self.rep_content_hash(row_hashes.loc[output_df.index], available_columns, filename),
+                'checksum': None,
+                'file_size': None
+            }
+            
+            previous = previous_manifest.get(entry['sales_person_id'])
+            if (previous is not None
+                    and (previous['file_name'], previous['content_hash']) == (filename, entry['content_hash'])
+                    and self.rep_file_intact(individual_folder, previous, verify=True)):
+                entry['checksum'], entry['file_size'] = previous['checksum'], previous['file_size']
+                unchanged += 1
+            else:
+                rep_files.append((filepath, output_df))
+            
+            manifest[entry['sales_person_id']] = entry
+        
+        # Remove files for reps who dropped out of the batch (or were renamed)
+        current_files = {entry['file_name']: entry for entry in manifest.values()}
+        removed = 0
+        for existing_file in individual_folder.glob("*.xlsx"):
+            if existing_file.name not in current_files and not existing_file.name.startswith("_"):
+                existing_file.unlink()
+                removed += 1
+        
+        # Workbooks are written in parallel (or serially) as a separate step
+        total_files = len(rep_files)
+        for filepath, checksum, file_size in self.write_rep_files(rep_files, parallel):
+            job.check_cancelled()
+            current_files[filepath.name].update(checksum=checksum, file_size=file_size)
+            files_created += 1
+            job.progress(self.on_progress, 1, files_created, total_files, f"Creating file {files_created} of {total_files}...")
+        
+        self.write_rep_manifest(individual_folder, manifest)
+        
+        return {
+            'folder': individual_folder,
+            'manifest': list(manifest.values()),
+            'files_created': files_created,
+            'unchanged': unchanged,
+            'removed': removed,
+            'total_records': sum(entry['row_count'] for entry in manifest.values()),
+            'total_payout': sum(entry['payout'] for entry in manifest.values())
+        }
+    
+    def rep_payout(self, output_df):
+        """Total payout on a rep's rows."""
+        if 'Payout' not in output_df.columns:
+            return 0.0
+        return float(pd.to_numeric(output_df['Payout'], errors='coerce').sum())
+    
+    def rep_file_intact(self, folder, entry, verify=False):
+        """The file is there at the size the manifest recorded (and, with verify, its checksum)."""
+        file_path = folder / entry['file_name']
+        try:
+            if file_path.stat().st_size != entry['file_size']:
+                return False
+        except OSError:
+            return False
+        return not verify or self.file_sha256(file_path) == entry['checksum']
+    
+    def rep_content_hash(self, row_hashes, columns, filename):
+        """Content hash of a rep's slice of the batch (plus its filename and layout)."""
+        digest = hashlib.sha256()
+        digest.update(f"{REP_FILE_VERSION}|{filename}|{'|'.join(map(str, columns))}".encode())
+        digest.update(row_hashes.to_numpy().tobytes())
+        return digest.hexdigest()
+    
+    def read_rep_manifest(self, folder):
+        """Return {SalesPersonID: manifest entry} from a batch folder's manifest."""
+        manifest_path = folder / "_rep_manifest.db"
+        if not manifest_path.exists():
+            return {}
+        
+        try:
+            with closing(sqlite3.connect(manifest_path)) as conn:
+                rows = conn.execute(
+                    f"SELECT {', '.join(REP_MANIFEST_COLUMNS)} FROM rep_files ORDER BY rowid"
+                ).fetchall()
+        except sqlite3.Error:
+            return {}
+        
+        return {row[0]: dict(zip(REP_MANIFEST_COLUMNS, row)) for row in rows}
+    
+    def write_rep_manifest(self, folder, manifest):
+        """Replace a batch folder's manifest with {SalesPersonID: manifest entry}."""
+        with closing(sqlite3.connect(folder / "_rep_manifest.db")) as conn:
+            with conn:
+                conn.execute("DROP TABLE IF EXISTS rep_files")
+                conn.execute(
+                    "CREATE TABLE rep_files ("
+                    "sales_person_id TEXT PRIMARY KEY, rep_name TEXT, file_name TEXT NOT NULL, "
+                    "row_count INTEGER NOT NULL, payout REAL NOT NULL, content_hash TEXT NOT NULL, "
+                    "checksum TEXT NOT NULL, file_size INTEGER NOT NULL)"
+                )
+                conn.executemany(
+                    f"INSERT INTO rep_files ({', '.join(REP_MANIFEST_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(REP_MANIFEST_COLUMNS))})",
+                    [tuple(entry[column] for column in REP_MANIFEST_COLUMNS) for entry in manifest.values()]
+                )
+    
+    def write_rep_files(self, rep_files, parallel):
+        """Write (filepath, output_df) rep files, yielding (filepath, sha256, size) as each is done."""
+        for key, result, error in self.run_parallel(write_rep_file, dict(enumerate(rep_files)), parallel):
+            if error is not None:
+                raise error
+            yield (rep_files[key][0], *result)
+    
+    def run_parallel(self, func, jobs, parallel):
+        """Run func(*args) for each key -> args in `jobs`, yielding (key, result, error)."""
+        pending = dict(jobs)
+        pool = self.get_process_pool() if parallel and pending else None
+        
+        if pool is not None:
+            futures = {}
+            try:
+                for key, args in pending.items():
+                    futures[pool.submit(func, *args)] = key
+                
+                for future in as_completed(futures):
+                    key = futures[future]
+                    try:
+                        result, error = future.result(), None
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as e:
+                        result, error = None, e
+                    del pending[key]
+                    yield key, result, error
+            except BrokenProcessPool:
+                self.process_pool = None
+            finally:
+                for future in futures:
+                    future.cancel()
+        
+        for key in list(pending):
+            args = pending.pop(key)
+            try:
+                result, error = func(*args), None
+            except Exception as e:
+                result, error = None, e
+            yield key, result, error
+    
+    # ==========================================
+    # STAGE 2: EMAIL DISTRIBUTION
+    # ==========================================
+    
+    def assess_rep_emails(self, folder, manifest, verify=False):
+        """Match a batch's manifest entries to the email directory by SalesPersonID."""
+        reps = []
+        damaged = []
+        for entry in manifest:
+            file_path = folder / entry['file_name']
+            if self.rep_file_intact(folder, entry, verify):
+                reps.append((entry['sales_person_id'], file_path, {'rows': entry['row_count'], 'payout': entry['payout']}))
+            else:
+                damaged.append({
+                    'SalesPersonID': entry['sales_person_id'],
+                    'File': entry['file_name'],
+                    'Reason': 'File missing or changed since split'
+                })
+        
+        email_mapping, missing_emails = self.match_rep_emails(reps)
+        return email_mapping, missing_emails + damaged
+    
+    def assess_batch_emails(self, year, batch, filtered_df):
+        """Match a batch's reps to the email directory straight from the master data."""
+        individual_folder = self.batch_folder(year, batch) / "Individual Emails"
+        available_columns = [col for col in self.output_columns if col in filtered_df.columns]
+        row_hashes = pd.util.hash_pandas_object(filtered_df[available_columns], index=False)
+        return self.match_rep_emails(
+            (sales_person_id, individual_folder / filename, {
+                'data': output_df, 'rows': len(output_df), 'payout': self.rep_payout(output_df),
+                'rep_name': str(rep_name),
+                'content_hash': self.rep_content_hash(row_hashes.loc[output_df.index], available_columns, filename)
+            })
+            for sales_person_id, rep_name, filename, output_df in self.plan_rep_files(year, batch, filtered_df)
+        )
+    
+    def match_rep_emails(self, reps):
+        """Match (SalesPersonID, file path, extra mapping fields) to the email directory."""
+        email_mapping = {}
+        missing_emails = []
+        
+        for sales_person_id, file_path, extra in reps:
+            if sales_person_id is not None:
+                sales_person_id = str(sales_person_id).strip()
+                
+                email_info = self.email_index.get(sales_person_id)
+                
+                if email_info is not None:
+                    if email_info['valid']:
+                        email_mapping[sales_person_id] = {
+                            'file': file_path,
+                            'email': email_info['email'],
+                            'name': email_info['name'],
+                            **extra
+                        }
+                    else:
+                        missing_emails.append({
+                            'SalesPersonID': sales_person_id,
+                            'File': file_path.name,
+                            'Reason': 'Invalid/missing email'
+                        })
+                else:
+                    missing_emails.append({
+                        'SalesPersonID': sales_person_id,
+                        'File': file_path.name,
+                        'Reason': 'ID not in email list'
+                    })
+        
+        return email_mapping, missing_emails
+    
+    def get_batch_display_info(self):
+        """Parse batch info for email content."""
+        if not self.selected_batch:
+            return "Unknown", "Unknown"
+        
+        batch_date = self.selected_batch
+        batch_year = self.selected_year or ""
+        
+        try:
+            date_parts = batch_date.replace("-", "/").split("/")
+            if len(date_parts) >= 1:
+                month_num = int(date_parts[0])
+                month_names = ['January', 'February', 'March', 'April', 'May', 'June',
+                               'July', 'August', 'September', 'October', 'November', 'December']
+                batch_month = month_names[month_num - 1] if 1 <= month_num <= 12 else batch_date
+            else:
+                batch_month = batch_date
+        except:
+            batch_month = batch_date
+        
+        return batch_month, batch_year
+    
+    def send_journal_folder(self, filepath):
+        """Batch folder holding the send journal for a rep file or management report."""
+        return Path(filepath).parents[1]
+    
+    def read_send_journal(self, folder, kind):
+        """Latest journal event per recipient for a batch folder ({} if nothing was sent yet)."""
+        if not (Path(folder) / SendJournal.FILENAME).exists():
+            return {}
+        with SendJournal(folder) as journal:
+            return journal.latest(kind)
+    
+    def already_sent(self, kind, mapping, path_key):
+        """IDs in a send mapping the batch's journal records as sent (for resume)."""
+        if not mapping:
+            return set()
+        folder = self.send_journal_folder(next(iter(mapping.values()))[path_key])
+        events = self.read_send_journal(folder, kind)
+        return {key for key in mapping if events.get(key, {}).get('status') == 'sent'}
+    
+    def rep_recap_lists(self, events, ids=None, payouts=None):
+        """(sent_emails, failed_emails) for the rep recap from journal events."""
+        payouts = payouts or {}
+        sent_emails = []
+        failed_emails = []
+        for sales_person_id in (events if ids is None else ids):
+            event = events.get(sales_person_id)
+            if event is None or event['status'] == 'queued':
+                continue
+            item = {
+                'SalesPersonID': sales_person_id,
+                'Name': event['name'],
+                'Email': event['email'],
+                'File': event['detail'],
+                'Payout': payouts.get(sales_person_id),
+                'Status': '✓ Sent' if event['status'] == 'sent' else f"✗ Failed: {event['error']}"
+            }
+            (sent_emails if event['status'] == 'sent' else failed_emails).append(item)
+        return sent_emails, failed_emails
+    
+    def mgmt_recap_lists(self, events, ids=None):
+        """(sent_emails, failed_emails) for the management recap from journal events."""
+        sent_emails = []
+        failed_emails = []
+        for mgr_id in (events if ids is None else ids):
+            event = events.get(mgr_id)
+            if event is None or event['status'] == 'queued':
+                continue
+            if event['status'] == 'sent':
+                sent_emails.append({'ManagerID': mgr_id, 'Name': event['name'], 'Level': event['detail'], 'Email': event['email']})
+            else:
+                failed_emails.append({'ManagerID': mgr_id, 'Name': event['name'], 'Level': event['detail'], 'Status': event['error']})
+        return sent_emails, failed_emails
+    
+    def transport_error(self):
+        """Why the selected mail backend can't be used, or None if it can."""
+        if self.mail_backend == 'outlook' and not OUTLOOK_AVAILABLE:
+            return "pywin32 is required for Outlook integration"
+        if self.mail_backend == 'smtp' and not self.smtp_host:
+            return "No SMTP host configured (set INCENTIVE_SMTP_HOST)"
+        return None
+    
+    def make_transport(self):
+        """Mail transport for the selected backend (use as a context manager)."""
+        if self.mail_backend == 'smtp':
+            return SmtpTransport(
+                self.sender_email, self.smtp_host, self.smtp_port,
+                self.smtp_username, self.smtp_password,
+                starttls=self.smtp_starttls, pool_size=self.send_concurrency
+            )
+        if self.mail_backend == 'file':
+            return FileTransport(self.sender_email, self.eml_folder or self.output_base / "Outbox")
+        return OutlookTransport(self.sender_email)
+    
+    def send_with_retry(self, transport, message, bucket=None, cancel_event=None):
+        """Send one message, retrying transient failures with exponential backoff."""
+        for attempt in range(self.send_retries + 1):
+            if bucket is not None and not bucket.acquire(cancel_event):
+                raise JobCancelled()
+            try:
+                transport.send(message)
+                return
+            except Exception as e:
+                if attempt == self.send_retries or not is_transient_send_error(e):
+                    raise
+                delay = min(self.send_backoff * 2 ** attempt, 60) * random.uniform(0.5, 1.0)
+                if cancel_event is None:
+                    time.sleep(delay)
+                elif cancel_event.wait(delay):
+                    raise JobCancelled() from e
+    
+    def deliver_messages(self, job, transport, messages):
+        """Send (key, message) pairs under the rate limit, yielding (key, error) as each finishes."""
+        bucket = TokenBucket(self.send_rate, self.send_burst) if self.send_rate else None
+        
+        def deliver(message):
+            if job.cancelled:
+                raise JobCancelled()
+            self.send_with_retry(transport, message, bucket, job.cancel_event)
+        
+        workers = self.send_concurrency if transport.concurrent else 1
+        if workers <= 1:
+            # Outlook's COM object belongs to this thread, so send inline
+            for key, message in messages:
+                try:
+                    deliver(message)
+                except JobCancelled:
+                    break
+                except Exception as e:
+                    yield key, str(e)
+                else:
+                    yield key, None
+            return
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(deliver, message): key for key, message in messages}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except JobCancelled:
+                    continue
+                except Exception as e:
+                    yield futures[future], str(e)
+                else:
+                    yield futures[future], None
+    
+    def create_email(self, recipient, sales_person_id, sales_person_name, 
+                     attachment, batch_month, batch_year, is_test=False, test_email=None):
+        """Build a rep's email as a transport message."""
+        batch_display = f"{batch_month} {batch_year}".strip()
+        subject = f"Incentive Detail Report and Payout Information - {batch_display} - {sales_person_id}"
+        
+        if is_test:
+            subject = f"[TEST] {subject}"
+        
+        body = f"""{sales_person_name} ({sales_person_id}) -
+
+Attached is your incentive detail report for the {batch_month} {batch_year} payment. This report details the specific incentives you earned during this pay period.
+
+If you have questions about the calculation of your final payout or any other aspect of your incentive details, please contact the CA Analytics Team - CAAnalyticsAll@breakthrubev.com
+
+-Analytics Team"""
+        
+        return {
+            'to': [test_email] if is_test else [recipient],
+            'cc': [] if is_test else [self.cc_email],
+            'subject': subject,
+            'body': body,
+            'attachments': [attachment]
+        }
+    
+    def rep_attachment(self, info):
+        """A rep's attachment: rendered in memory if the mapping carries its rows, else the file."""
+        if info.get('data') is not None:
+            return (info['file'].name, render_rep_file(info['data']))
+        return info['file']
+    
+    def render_rep_attachments(self, job, email_mapping, parallel):
+        """Render the in-memory reps of a send mapping to {SalesPersonID: bytes} on the worker pool."""
+        jobs = {key: (info['data'],) for key, info in email_mapping.items() if info.get('data') is not None}
+        rendered = {}
+        for key, data, error in self.run_parallel(render_rep_file, jobs, parallel):
+            job.check_cancelled()
+            if error is not None:
+                raise error
+            rendered[key] = data
+        return rendered
+    
+    def archive_rep_files(self, reps):
+        """Write rendered {SalesPersonID: (mapping info, bytes)} rep workbooks and record them in the manifest."""
+        folders = {}
+        for sales_person_id, (info, data) in reps.items():
+            folders.setdefault(info['file'].parent, {})[sales_person_id] = (info, data)
+        
+        written = 0
+        for folder, folder_reps in folders.items():
+            folder.mkdir(parents=True, exist_ok=True)
+            manifest = self.read_rep_manifest(folder)
+            for sales_person_id, (info, data) in folder_reps.items():
+                entry = {
+                    'sales_person_id': sales_person_id,
+                    'rep_name': info['rep_name'],
+                    'file_name': info['file'].name,
+                    'row_count': info['rows'],
+                    'payout': info['payout'],
+                    'content_hash': info['content_hash'],
+                    'checksum': hashlib.sha256(data).hexdigest(),
+                    'file_size': len(data)
+                }
+                
+                # The Stage 1 file already holds these rows; keep it and its checksum
+                previous = manifest.get(sales_person_id)
+                if (previous is not None
+                        and (previous['file_name'], previous['content_hash']) == (entry['file_name'], entry['content_hash'])
+                        and self.rep_file_intact(folder, previous)):
+                    continue
+                
+                info['file'].write_bytes(data)
+                manifest[sales_person_id] = entry
+                written += 1
+            self.write_rep_manifest(folder, manifest)
+        return written
+    
+    def send_rep_emails(self, job, email_mapping, batch_month, batch_year, resume=False, archive=True, parallel=True):
+        """Send every rep email, then the recap (runs on the job thread)."""
+        skipped = self.already_sent('rep', email_mapping, 'file') if resume else set()
+        pending = {key: info for key, info in email_mapping.items() if key not in skipped}
+        total_emails = len(pending)
+        
+        job.progress(self.on_progress, 2, 0, total_emails, "Preparing attachments...")
+        rendered = self.render_rep_attachments(job, pending, parallel)
+        
+        archive_future = None
+        if rendered and archive:
+            archive_executor = ThreadPoolExecutor(max_workers=1)
+            archive_future = archive_executor.submit(
+                self.archive_rep_files, {key: (pending[key], data) for key, data in rendered.items()}
+            )
+            archive_executor.shutdown(wait=False)
+        
+        messages = [
+            (sales_person_id, self.create_email(
+                recipient=info['email'],
+                sales_person_id=sales_person_id,
+                sales_person_name=info['name'],
+                attachment=(info['file'].name, rendered[sales_person_id]) if sales_person_id in rendered else info['file'],
+                batch_month=batch_month,
+                batch_year=batch_year,
+                is_test=False
+            ))
+            for sales_person_id, info in pending.items()
+        ]
+        
+        folder = self.send_journal_folder(next(iter(email_mapping.values()))['file'])
+        with SendJournal(folder) as journal, self.make_transport() as transport:
+            journal.log('rep', [
+                (sales_person_id, 'queued', info['name'], info['email'], info['file'].name, None)
+                for sales_person_id, info in pending.items()
+            ])
+            
+            done = 0
+            for sales_person_id, error in self.deliver_messages(job, transport, messages):
+                info = pending[sales_person_id]
+                journal.log('rep', [(
+                    sales_person_id, 'failed' if error else 'sent',
+                    info['name'], info['email'], info['file'].name, error
+                )])
+                done += 1
+                job.progress(self.on_progress, 2, done, total_emails, f"Sent {done} of {total_emails}...")
+            
+            # Recap comes from the journal in mapping order, so a resumed run reports the whole batch
+            sent_emails, failed_emails = self.rep_recap_lists(
+                journal.latest('rep'), email_mapping,
+                {key: info.get('payout') for key, info in email_mapping.items()}
+            )
+            
+            self.send_recap_email(transport, sent_emails, failed_emails, batch_month, batch_year)
+        
+        if archive_future is not None:
+            try:
+                archive_future.result()
+            except Exception as e:
+                self.warn("Archive Warning", f"Emails sent but archive copies failed:\n{str(e)}")
+        
+        return sent_emails, failed_emails, job.cancelled
+    
+    def send_recap_email(self, transport, sent_emails, failed_emails, batch_month, batch_year):
+        """Send recap email (from the job thread)."""
+        try:
+            batch_display = f"{batch_month} {batch_year}".strip()
+            subject = f"Incentive Email Distribution Recap - {batch_display}"
+            
+            total_sent = len(sent_emails)
+            total_failed = len(failed_emails)
+            success_rate = (total_sent / (total_sent + total_failed) * 100) if (total_sent + total_failed) > 0 else 0
+            
+            body = f"""INCENTIVE EMAIL DISTRIBUTION RECAP
+{'='*50}
+
+Batch: {self.created_batch_folder.name if self.created_batch_folder else 'Unknown'}
+Date Sent: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+
+SUMMARY
+{'-'*30}
+Total Emails Sent: {total_sent}
+Total Failed: {total_failed}
+Success Rate: {success_rate:.1f}%
+"""
+            
+            sent_payouts = [item['Payout'] for item in sent_emails if item.get('Payout') is not None]
+            if sent_payouts:
+                body += f"Total Payout Sent: ${sum(sent_payouts):,.2f}\n"
+            
+            body += f"""
+
+DETAILED SEND LOG
+{'-'*30}
+"""
+            
+            for item in sent_emails:
+                payout = f" | ${item['Payout']:,.2f}" if item.get('Payout') is not None else ""
+                body += f"✓ {item['SalesPersonID']} | {item['Name']} | {item['Email']}{payout}\n"
+            
+            if failed_emails:
+                body += f"""
+
+FAILED SENDS
+{'-'*30}
+"""
+                for item in failed_emails:
+                    body += f"✗ {item['SalesPersonID']} | {item['Name']} | {item['Status']}\n"
+            
+            body += f"""
+
+{'='*50}
+Automated recap from Incentive Batch Manager
+"""
+            
+            self.send_with_retry(transport, {'to': list(self.recap_recipients), 'subject': subject, 'body': body})
+            
+        except Exception as e:
+            self.warn("Recap Warning", f"Emails sent but recap failed:\n{str(e)}")
+    
+    # ==========================================
+    # STAGE 3: MANAGEMENT REPORTING
+    # ==========================================
+    
+    def build_management_reports(self, job, year, batch, batch_df, parallel):
+        """Build and write every manager's report (runs on the job thread)."""
+        batch_df = batch_df.copy()
+        batch_df['SalesPersonID'] = self.normalize_ids(batch_df['SalesPersonID'])
+        
+        # Per-rep totals computed once; every manager report slices from it
+        rollup = self.build_batch_rollup(batch_df)
+        
+        # Get incentive IDs
+        incentive_ids = set(x for x in batch_df['SalesPersonID'].unique() if x is not None)
+        hierarchy_ids = set(x for x in self.hierarchy_df['Sales Person ID'].dropna().unique() if x is not None)
+        
+        matched_ids = incentive_ids & hierarchy_ids
+        unmatched_ids = incentive_ids - hierarchy_ids
+        
+        coverage_pct = len(matched_ids) / len(incentive_ids) * 100 if incentive_ids else 0
+        coverage = (
+            f"Coverage: {len(matched_ids)} of {len(incentive_ids)} matched ({coverage_pct:.1f}%), {len(unmatched_ids)} unmatched"
+        )
+        
+        # Create output folder: year / batch / Management Reports
+        output_folder = self.batch_folder(year, batch) / "Management Reports"
+        output_folder.mkdir(parents=True, exist_ok=True)
+        
+        # Clear old reports
+        for f in output_folder.glob("*.xlsx"):
+            f.unlink()
+        
+        # Managers with at least one incentive-bearing team member, in one pass
+        managers_to_report = []
+        for level_code, id_col, name_col in MANAGER_LEVELS:
+            level_index = self.hierarchy_index[level_code]
+            for mgr_id, mgr_name in level_index['managers']:
+                if not level_index['reps'][mgr_id].isdisjoint(incentive_ids):
+                    managers_to_report.append((level_code, mgr_id, mgr_name))
+        
+        # Sheet data is built here; the workbooks are written by the worker pool
+        report_jobs = {}
+        for order, (level_code, mgr_id, mgr_name) in enumerate(managers_to_report):
+            job.check_cancelled()
+            report = self.create_manager_report(
+                level_code, mgr_id, mgr_name,
+                batch_df, year, batch, output_folder, rollup
+            )
+            if report:
+                report_jobs[order] = report
+        
+        # Master Management Summary Report goes out with the rest
+        try:
+            master_report = self.create_master_summary_report(batch_df, year, batch, output_folder, rollup)
+        except Exception as e:
+            print(f"Error creating master summary: {e}")
+            master_report = None
+        if master_report:
+            report_jobs[None] = master_report
+        
+        total_reports = len(report_jobs)
+        completed = 0
+        written = {}
+        errors = []
+        for order, filepath, error in self.run_parallel(write_manager_report, report_jobs, parallel):
+            job.check_cancelled()
+            completed += 1
+            
+            if order is None:
+                if error is not None:
+                    print(f"Error creating master summary: {error}")
+                continue
+            
+            level_code, mgr_id, mgr_name = managers_to_report[order]
+            if error is not None:
+                errors.append({
+                    'level': level_code,
+                    'id': mgr_id,
+                    'name': mgr_name,
+                    'error': str(error)
+                })
+            else:
+                written[order] = {
+                    'level': level_code,
+                    'id': mgr_id,
+                    'name': mgr_name,
+                    'filepath': filepath
+                }
+            
+            job.progress(self.on_progress, 3, completed, total_reports, f"Creating report {len(written)}...")
+        
+        # Workers finish out of order; keep reports in hierarchy order
+        return {
+            'reports': [written[order] for order in sorted(written)],
+            'errors': errors,
+            'output_folder': output_folder,
+            'total': total_reports,
+            'coverage': coverage,
+            'coverage_pct': coverage_pct
+        }
+    
+    def build_batch_rollup(self, batch_df):
+        """Aggregate a batch once per rep (totals and row positions) for all management reports."""
+        grouped = batch_df.groupby('SalesPersonID')
+        totals = grouped.agg({'Rep Name': 'first', 'Payout': 'sum', 'Incentive #': 'count'})
+        # Payouts are cents; drop float noise from summing over the whole batch
+        totals['Payout'] = totals['Payout'].round(2)
+        return {'totals': totals, 'rows': grouped.indices}
+    
+    def hierarchy_lookup_frame(self, hierarchy_df, id_col, columns, keep='first'):
+        """Index hierarchy name columns by an ID column for vectorized joins."""
+        ids = hierarchy_df[id_col]
+        rows = hierarchy_df[ids.notna() & (ids != '')].drop_duplicates(subset=[id_col], keep=keep)
+        lookup = pd.DataFrame(
+            {name: (rows[src] if src in rows.columns else '') for name, src in columns.items()},
+            index=rows.index
+        )
+        lookup.index = rows[id_col].to_numpy()
+        return lookup
+    
+    def attach_hierarchy_names(self, frame, lookup, columns):
+        """Add lookup columns to `frame` aligned on its SalesPersonID ('' where there is no match)."""
+        if not columns:
+            return
+        
+        keys = frame['SalesPersonID'].to_numpy()
+        if lookup is None:
+            for col_name in columns:
+                frame[col_name] = ''
+            return
+        
+        missing = ~frame['SalesPersonID'].isin(lookup.index).to_numpy()
+        matched = lookup.reindex(keys)
+        for col_name in columns:
+            values = matched[col_name].to_numpy(dtype=object)
+            values[missing] = ''
+            frame[col_name] = values
+    
+    def create_manager_report(self, manager_level, manager_id, manager_name, batch_df, batch_year, paid_on_batch, output_folder, rollup):
+        """Build a manager's report as (filepath, {sheet name: DataFrame}), or None if the team has no rows."""
+        rep_totals = rollup['totals']
+        rep_rows = rollup['rows']
+        
+        level_config = {
+            'VP': {'id_col': 'Vice President ID', 'include_levels': ['DIRECTOR', 'AM', 'FSM', 'REP']},
+            'DIRECTOR': {'id_col': 'Division Manager ID', 'include_levels': ['AM', 'FSM', 'REP']},
+            'AM': {'id_col': 'Area Manager ID', 'include_levels': ['FSM', 'REP']},
+            'FSM': {'id_col': 'Field Sales Manager ID', 'include_levels': ['REP']}
+        }
+        
+        config = level_config[manager_level]
+        
+        team_rows = self.hierarchy_index[manager_level]['rows'].get(manager_id)
+        
+        if team_rows is None:
+            return None
+        
+        team_hierarchy = self.hierarchy_df.iloc[team_rows]
+        
+        level_id_cols = {
+            'DIRECTOR': 'Division Manager ID', 'AM': 'Area Manager ID',
+            'FSM': 'Field Sales Manager ID', 'REP': 'Sales Person ID'
+        }
+        level_labels = {'DIRECTOR': 'Director', 'AM': 'Area Mgr', 'FSM': 'FSM', 'REP': 'Rep'}
+        
+        # Hierarchy level order (for determining what columns to show)
+        level_order = ['VP', 'DIRECTOR', 'AM', 'FSM', 'REP']
+        manager_level_idx = level_order.index(manager_level)
+        
+        # Build lookups for each level type (indexed frames joined onto the tabs)
+        # For REPs: lookup by Sales Person ID (last row for a rep wins)
+        rep_lookup = self.hierarchy_lookup_frame(team_hierarchy, 'Sales Person ID', {
+            'Director': 'Division Manager Name',
+            'Area Manager': 'Area Manager Name',
+            'FSM': 'Field Sales Manager Name'
+        }, keep='last')
+        
+        # For FSMs: lookup by Field Sales Manager ID
+        fsm_lookup = self.hierarchy_lookup_frame(team_hierarchy, 'Field Sales Manager ID', {
+            'Director': 'Division Manager Name',
+            'Area Manager': 'Area Manager Name'
+        })
+        
+        # For AMs: lookup by Area Manager ID
+        am_lookup = self.hierarchy_lookup_frame(team_hierarchy, 'Area Manager ID', {
+            'Director': 'Division Manager Name'
+        })
+        
+        # For Directors: no lookup needed (no hierarchy above within report)
+        
+        detail_columns = [
+            'Incentive #', 'SalesPersonID', 'Position ID', 'Territory ID', 
+            'Rep Name', 'Payout', 'Supplier', 'Desc', 'Sales Role', 
+            'Channel', 'Payout Type', 'Start Date', 'End Date', 
+            'Submitted By', 'Tracking Method', 'Paid On Batch', 'Batch Year'
+        ]
+        
+        sheets_data = {}
+        total_payout = 0
+        total_people = 0
+        
+        for level in config['include_levels']:
+            id_col = level_id_cols[level]
+            label = level_labels[level]
+            
+            # Only people with incentives on this batch appear in the rollup
+            people_ids = [x for x in team_hierarchy[id_col].dropna().unique() if x in rep_rows]
+            
+            if not people_ids:
+                continue
+            
+            level_detail = batch_df.iloc[np.sort(np.concatenate([rep_rows[x] for x in people_ids]))].copy()
+            
+            # Determine which hierarchy columns to include for this tab
+            # Include levels BETWEEN manager_level and current tab level
+            current_level_idx = level_order.index(level)
+            hier_cols_to_include = []
+            
+            for hier_level in ['DIRECTOR', 'AM', 'FSM']:
+                hier_level_idx = level_order.index(hier_level)
+                # Include if it's between manager level and current tab level
+                if hier_level_idx > manager_level_idx and hier_level_idx < current_level_idx:
+                    if hier_level == 'DIRECTOR':
+                        hier_cols_to_include.append('Director')
+                    elif hier_level == 'AM':
+                        hier_cols_to_include.append('Area Manager')
+                    elif hier_level == 'FSM':
+                        hier_cols_to_include.append('FSM')
+            
+            # Select the right lookup based on the level we're reporting on
+            if level == 'REP':
+                lookup = rep_lookup
+            elif level == 'FSM':
+                lookup = fsm_lookup
+            elif level == 'AM':
+                lookup = am_lookup
+            else:
+                lookup = None
+            
+            # Add hierarchy columns to detail
+            self.attach_hierarchy_names(level_detail, lookup, hier_cols_to_include)
+            
+            # Summary - sliced from the per-rep rollup (hierarchy columns are per person)
+            level_summary = rep_totals.loc[sorted(people_ids)].reset_index()
+            self.attach_hierarchy_names(level_summary, lookup, hier_cols_to_include)
+            
+            # Rename columns
+            rename_cols = {'SalesPersonID': 'ID', 'Rep Name': 'Name', 'Payout': 'Total Payout', 'Incentive #': 'Incentive Count'}
+            level_summary = level_summary.rename(columns=rename_cols)
+            
+            # Reorder: hierarchy cols FIRST, then ID, Name, Total Payout, Incentive Count
+            col_order = hier_cols_to_include + ['ID', 'Name', 'Total Payout', 'Incentive Count']
+            level_summary = level_summary[col_order]
+            level_summary = level_summary.sort_values('Total Payout', ascending=False)
+            
+            # Detail - hierarchy columns first
+            available_detail_cols = [col for col in detail_columns if col in level_detail.columns]
+            level_detail_out = level_detail[hier_cols_to_include + available_detail_cols].copy()
+            level_detail_out = level_detail_out.sort_values(['Rep Name', 'Payout'], ascending=[True, False])
+            
+            sheets_data[f'{label} Summary'] = level_summary
+            sheets_data[f'{label} Detail'] = level_detail_out
+            
+            total_payout += level_summary['Total Payout'].sum()
+            total_people += len(level_summary)
+        
+        if not sheets_data:
+            return None
+        
+        manager_name_clean = str(manager_name).replace("/", "-").replace("\\", "-").replace(":", "-").replace("*", "-").replace("?", "-").strip()
+        filename = f"{manager_level}_{manager_id}_{manager_name_clean}.xlsx"
+        filepath = output_folder / filename
+        
+        summary_data = pd.DataFrame({
+            'Metric': ['Manager Level', 'Manager ID', 'Manager Name', 'Batch Period',
+                      'Total People with Incentives', 'Total Payout', 'Report Generated'],
+            'Value': [manager_level, manager_id, manager_name, f"{paid_on_batch} {batch_year}",
+                     total_people, f"${total_payout:,.2f}", datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
+        })
+        sheets = {'Summary': summary_data}
+        for sheet_name, df in sheets_data.items():
+            sheets[sheet_name[:31]] = df
+        
+        return filepath, sheets
+    
+    def create_master_summary_report(self, batch_df, batch_year, paid_on_batch, output_folder, rollup):
+        """Build the master summary (all levels, VP hierarchy for filtering) as (filepath, sheets)."""
+        rep_totals = rollup['totals']
+        rep_rows = rollup['rows']
+        
+        # Build complete hierarchy lookup for all people: the first hierarchy
+        # row naming a person (as rep, FSM, AM or director, in that order) wins
+        person_cols = ['Sales Person ID', 'Field Sales Manager ID', 'Area Manager ID', 'Division Manager ID']
+        positions = np.arange(len(self.hierarchy_df))
+        person_rows = pd.concat([
+            pd.DataFrame({'Person ID': self.hierarchy_df[id_col].to_numpy(), 'row': positions, 'order': order})
+            for order, id_col in enumerate(person_cols)
+        ]).sort_values(['row', 'order'], kind='stable')
+        first_rows = self.hierarchy_df.iloc[person_rows['row'].to_numpy()].assign(
+            **{'Person ID': person_rows['Person ID'].to_numpy()}
+        )
+        hierarchy_lookup = self.hierarchy_lookup_frame(first_rows, 'Person ID', {
+            'VP': 'Vice President Name',
+            'Director': 'Division Manager Name',
+            'Area Manager': 'Area Manager Name',
+            'FSM': 'Field Sales Manager Name'
+        })
+        
+        detail_columns = [
+            'Incentive #', 'SalesPersonID', 'Position ID', 'Territory ID', 
+            'Rep Name', 'Payout', 'Supplier', 'Desc', 'Sales Role', 
+            'Channel', 'Payout Type', 'Start Date', 'End Date', 
+            'Submitted By', 'Tracking Method', 'Paid On Batch', 'Batch Year'
+        ]
+        
+        level_id_cols = {
+            'DIRECTOR': 'Division Manager ID', 'AM': 'Area Manager ID',
+            'FSM': 'Field Sales Manager ID', 'REP': 'Sales Person ID'
+        }
+        level_labels = {'DIRECTOR': 'Director', 'AM': 'Area Mgr', 'FSM': 'FSM', 'REP': 'Rep'}
+        
+        sheets_data = {}
+        
+        for level in ['DIRECTOR', 'AM', 'FSM', 'REP']:
+            id_col = level_id_cols[level]
+            label = level_labels[level]
+            
+            # All people at this level with incentives on this batch
+            people_ids = [x for x in self.hierarchy_df[id_col].dropna().unique() if x in rep_rows]
+            
+            if not people_ids:
+                continue
+            
+            # Get their incentive records
+            level_detail = batch_df.iloc[np.sort(np.concatenate([rep_rows[x] for x in people_ids]))].copy()
+            
+            # Determine which hierarchy columns to show (levels above current)
+            if level == 'DIRECTOR':
+                show_hier = ['VP']
+            elif level == 'AM':
+                show_hier = ['VP', 'Director']
+            elif level == 'FSM':
+                show_hier = ['VP', 'Director', 'Area Manager']
+            else:  # REP
+                show_hier = ['VP', 'Director', 'Area Manager', 'FSM']
+            
+            # Add the hierarchy columns shown on this tab (including VP)
+            self.attach_hierarchy_names(level_detail, hierarchy_lookup, show_hier)
+            
+            # Summary - sliced from the per-rep rollup
+            level_summary = rep_totals.loc[sorted(people_ids)].reset_index()
+            self.attach_hierarchy_names(level_summary, hierarchy_lookup, show_hier)
+            level_summary = level_summary.rename(columns={
+                'SalesPersonID': 'ID', 'Rep Name': 'Name', 
+                'Payout': 'Total Payout', 'Incentive #': 'Incentive Count'
+            })
+            
+            col_order = show_hier + ['ID', 'Name', 'Total Payout', 'Incentive Count']
+            level_summary = level_summary[col_order]
+            level_summary = level_summary.sort_values('Total Payout', ascending=False)
+            
+            # Detail
+            available_detail_cols = [col for col in detail_columns if col in level_detail.columns]
+            level_detail_out = level_detail[show_hier + available_detail_cols].copy()
+            level_detail_out = level_detail_out.sort_values(['Rep Name', 'Payout'], ascending=[True, False])
+            
+            sheets_data[f'{label} Summary'] = level_summary
+            sheets_data[f'{label} Detail'] = level_detail_out
+        
+        if not sheets_data:
+            return None
+        
+        # Calculate totals
+        total_payout = batch_df['Payout'].sum()
+        total_people = batch_df['SalesPersonID'].nunique()
+        
+        filepath = output_folder / "_MANAGEMENT_SUMMARY.xlsx"
+        
+        # Summary sheet
+        summary_data = pd.DataFrame({
+            'Metric': ['Report Type', 'Batch Period', 'Total People with Incentives', 
+                      'Total Payout', 'Report Generated'],
+            'Value': ['Master Management Summary', f"{paid_on_batch} {batch_year}",
+                     total_people, f"${total_payout:,.2f}", 
+                     datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
+        })
+        sheets = {'Summary': summary_data}
+        for sheet_name, df in sheets_data.items():
+            sheets[sheet_name[:31]] = df
+        
+        return filepath, sheets
+    
+    def list_mgmt_reports(self, output_folder):
+        """Management reports already written to a folder, in hierarchy order."""
+        level_order = [level_code for level_code, _, _ in MANAGER_LEVELS]
+        reports = []
+        for filepath in output_folder.glob("*.xlsx"):
+            parts = filepath.stem.split('_', 2)
+            if len(parts) == 3 and parts[0] in level_order:
+                reports.append({'level': parts[0], 'id': parts[1], 'name': parts[2], 'filepath': filepath})
+        reports.sort(key=lambda report: (level_order.index(report['level']), report['filepath'].name))
+        return reports
+    
+    def assess_mgmt_emails(self, mgmt_reports):
+        """Match management reports to the email directory by manager ID."""
+        mgmt_email_mapping = {}
+        mgmt_missing_emails = []
+        
+        for report in mgmt_reports:
+            mgr_id = report['id']
+            mgr_name = report['name']
+            
+            # Look up email
+            email_info = self.email_index.get(mgr_id)
+            
+            if email_info is not None:
+                if email_info['valid']:
+                    mgmt_email_mapping[mgr_id] = {
+                        'email': email_info['email'],
+                        'name': mgr_name,
+                        'filepath': report['filepath'],
+                        'level': report['level']
+                    }
+                else:
+                    mgmt_missing_emails.append({
+                        'id': mgr_id,
+                        'name': mgr_name,
+                        'reason': 'Invalid email'
+                    })
+            else:
+                mgmt_missing_emails.append({
+                    'id': mgr_id,
+                    'name': mgr_name,
+                    'reason': 'ID not found in email list'
+                })
+        
+        return mgmt_email_mapping, mgmt_missing_emails
+    
+    def create_mgmt_email(self, recipient, manager_id, manager_name, manager_level, 
+                          batch_month, batch_year, attachment_path, test_email=None):
+        """Build a management report email as a transport message."""
+        level_titles = {
+            'VP': 'Vice President',
+            'DIRECTOR': 'Division Manager',
+            'AM': 'Area Manager',
+            'FSM': 'Field Sales Manager'
+        }
+        level_title = level_titles.get(manager_level, manager_level)
+        
+        if test_email:
+            to = [test_email]
+            cc = []
+            subject = f"[TEST] Incentive Summary Report - {level_title} - {batch_month} {batch_year}"
+        else:
+            to = [recipient]
+            cc = [self.cc_email]
+            subject = f"Incentive Summary Report - {level_title} - {batch_month} {batch_year}"
+        
+        html = f"""
+<html>
+<body style="font-family: Calibri, Arial, sans-serif; font-size: 11pt; color: #333333;">
+
+<p>{manager_name} ({manager_id}),</p>
+
+<p>Attached is your team's incentive summary report for the <strong>{batch_month} {batch_year}</strong> payment period.</p>
+
+<p>This report provides a detailed breakdown of incentive earnings for your team members, including:</p>
+<ul style="margin-left: 20px;">
+    <li>Summary tabs showing total payouts by team member</li>
+    <li>Detail tabs with individual incentive line items</li>
+</ul>
+
+<p>Please review the report to understand your team's incentive performance. If you have questions about the calculations or need additional information, please contact the CA Analytics Team at <a href="mailto:CAAnalyticsAll@breakthrubev.com" style="color: #0563C1;">CAAnalyticsAll@breakthrubev.com</a></p>
+
+<p style="margin-top: 20px;">-Analytics Team</p>
+
+</body>
+</html>
+"""
+        
+        return {'to': to, 'cc': cc, 'subject': subject, 'body': '', 'html': html, 'attachments': [attachment_path]}
+    
+    def send_mgmt_emails(self, job, mgmt_email_mapping, batch_month, batch_year, resume=False):
+        """Send every management email, then the recap (runs on the job thread)."""
+        skipped = self.already_sent('mgmt', mgmt_email_mapping, 'filepath') if resume else set()
+        pending = {key: info for key, info in mgmt_email_mapping.items() if key not in skipped}
+        count = len(pending)
+        messages = [
+            (mgr_id, self.create_mgmt_email(
+                info['email'], mgr_id, info['name'], info['level'],
+                batch_month, batch_year, info['filepath']
+            ))
+            for mgr_id, info in pending.items()
+        ]
+        
+        folder = self.send_journal_folder(next(iter(mgmt_email_mapping.values()))['filepath'])
+        with SendJournal(folder) as journal, self.make_transport() as transport:
+            journal.log('mgmt', [
+                (mgr_id, 'queued', info['name'], info['email'], info['level'], None)
+                for mgr_id, info in pending.items()
+            ])
+            
+            done = 0
+            for mgr_id, error in self.deliver_messages(job, transport, messages):
+                info = pending[mgr_id]
+                journal.log('mgmt', [(
+                    mgr_id, 'failed' if error else 'sent', info['name'], info['email'], info['level'], error
+                )])
+                done += 1
+                job.progress(self.on_progress, 3, done, count, f"Sent {done} of {count}...")
+            
+            sent_emails, failed_emails = self.mgmt_recap_lists(journal.latest('mgmt'), mgmt_email_mapping)
+            
+            # Send recap
+            self.send_mgmt_recap_email(transport, sent_emails, failed_emails, batch_month, batch_year)
+        
+        return sent_emails, failed_emails, job.cancelled
+    
+    def send_mgmt_recap_email(self, transport, sent_emails, failed_emails, batch_month, batch_year):
+        """Send recap email for management report distribution (from the job thread)."""
+        try:
+            subject = f"Management Incentive Report Distribution Recap - {batch_month} {batch_year}"
+            
+            total_sent = len(sent_emails)
+            total_failed = len(failed_emails)
+            success_rate = (total_sent / (total_sent + total_failed) * 100) if (total_sent + total_failed) > 0 else 0
+            
+            body = f"""
+MANAGEMENT INCENTIVE REPORT DISTRIBUTION RECAP
+{'='*50}
+
+Batch: {batch_month} {batch_year}
+Date Sent: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+
+SUMMARY
+{'-'*30}
+Total Emails Sent: {total_sent}
+Total Failed: {total_failed}
+Success Rate: {success_rate:.1f}%
+
+
+DETAILED SEND LOG
+{'-'*30}
+"""
+            
+            # Group by level
+            for level in ['VP', 'DIRECTOR', 'AM', 'FSM']:
+                level_sent = [e for e in sent_emails if e['Level'] == level]
+                if level_sent:
+                    body += f"\n{level}s:\n"
+                    for item in level_sent:
+                        body += f"  ✓ {item['ManagerID']} | {item['Name']} | {item['Email']}\n"
+            
+            if failed_emails:
+                body += f"""
+
+FAILED SENDS
+{'-'*30}
+"""
+                for item in failed_emails:
+                    body += f"✗ {item['ManagerID']} | {item['Name']} | {item['Status']}\n"
+            
+            body += f"""
+
+{'='*50}
+Automated recap from Incentive Batch Manager
+"""
+            
+            self.send_with_retry(transport, {'to': list(self.recap_recipients), 'subject': subject, 'body': body})
+            
+        except Exception as e:
+            self.warn("Recap Warning", f"Emails sent but recap failed:\n{str(e)}")
+
+
+class IncentiveBatchManager(IncentiveBatchEngine):
+    """Tk front end over IncentiveBatchEngine."""
+    
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Incentive Batch Manager")
+        self.root.geometry("750x1100")
+        self.root.resizable(False, False)
+        
+        # Configure styles
+        self.style = ttk.Style()
+        self.style.configure("Title.TLabel", font=("Segoe UI", 16, "bold"))
+        self.style.configure("Section.TLabel", font=("Segoe UI", 11, "bold"))
+        self.style.configure("Header.TLabel", font=("Segoe UI", 10, "bold"))
+        self.style.configure("Info.TLabel", font=("Segoe UI", 9))
+        self.style.configure("Success.TLabel", font=("Segoe UI", 9), foreground="green")
+        self.style.configure("Warning.TLabel", font=("Segoe UI", 9), foreground="orange")
+        self.style.configure("Error.TLabel", font=("Segoe UI", 9), foreground="red")
+        
+        super().__init__()
+        
+        # ===== Background Work =====
+        # Worker threads never touch widgets; they post callbacks to ui_queue
+        self.ui_queue = queue.Queue()
+        self.load_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="load")
+        self.pending_loads = 0
+        self.reloaded_sources = []
+        # Source workbook stamps as last submitted for loading and as last polled
+        self.seen_stamps = {}
+        self.polled_stamps = {}
+        # Long stages (split, report generation, sends) run one at a time here
+        self.job_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job")
+        self.current_job = None
+        
+        # Build UI
+        self.create_widgets()
+        
+        # Load data on startup
+        self.root.after(50, self.poll_ui_queue)
+        self.root.after(100, self.initial_load)
+        self.root.after(SOURCE_POLL_MS, self.poll_sources)
+    
+    def create_widgets(self):
+        """Create all UI widgets."""
+        # Create scrollable canvas
+        canvas = tk.Canvas(self.root)
+        scrollbar = ttk.Scrollbar(self.root, orient="vertical", command=canvas.yview)
+        self.scrollable_frame = ttk.Frame(canvas, padding="15")
+        
+        self.scrollable_frame.bind(
+            "<Configure>",
+            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
+        )
+        
+        canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
+        canvas.configure(yscrollcommand=scrollbar.set)
+        
+        # Enable mousewheel scrolling
+        def _on_mousewheel(event):
+            canvas.yview_scroll(int(-1*(event.delta/120)), "units")
+        canvas.bind_all("<MouseWheel>", _on_mousewheel)
+        
+        canvas.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        
+        main_frame = self.scrollable_frame
+        
+        # ===== Title =====
+        ttk.Label(
+            main_frame, 
+            text="Incentive Batch Manager",
+            style="Title.TLabel"
+        ).pack(pady=(0, 5))
+        
+        ttk.Label(
+            main_frame,
+            text="Split & Email Distribution Tool",
+            style="Info.TLabel"
+        ).pack(pady=(0, 15))
+        
+        # ========================================
+        # STAGE 1: BATCH SPLITTING
+        # ========================================
+        stage1_frame = ttk.LabelFrame(main_frame, text="STAGE 1: Create Batch Files", padding="10")
+        stage1_frame.pack(fill=tk.X, pady=(0, 15))
+        
+        # --- Status ---
+        status_frame = ttk.Frame(stage1_frame)
+        status_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        ttk.Label(status_frame, text="Data Status:", style="Header.TLabel").pack(anchor=tk.W)
+        self.data_status = ttk.Label(
+            status_frame,
+            text="Loading...",
+            style="Info.TLabel"
+        )
+        self.data_status.pack(anchor=tk.W)
+        
+        # --- Batch Selection ---
+        selection_frame = ttk.LabelFrame(stage1_frame, text="Batch Selection", padding="10")
+        selection_frame.pack(fill=tk.X, pady=(5, 10))
+        
+        # Batch Year
+        year_frame = ttk.Frame(selection_frame)
+        year_frame.pack(fill=tk.X, pady=(0, 8))
+        
+        ttk.Label(year_frame, text="Batch Year:", width=15, style="Header.TLabel").pack(side=tk.LEFT)
+        self.year_var = tk.StringVar()
+        self.year_combo = ttk.Combobox(
+            year_frame, 
+            textvariable=self.year_var, 
+            state="readonly",
+            width=25
+        )
+        self.year_combo.pack(side=tk.LEFT, padx=(10, 0))
+        self.year_combo.bind("<<ComboboxSelected>>", self.on_year_selected)
+        
+        # Paid On Batch
+        batch_frame = ttk.Frame(selection_frame)
         batch_frame.pack(fill=tk.X)
         
         ttk.Label(batch_frame, text="Paid On Batch:", width=15, style="Header.TLabel").pack(side=tk.LEFT)
@@ -299,6 +2653,15 @@ class IncentiveBatchManager:
         )
         self.sync_btn.pack(side=tk.LEFT)
         
+        self.export_btn = ttk.Button(
+            sync_btn_frame,
+            text="Export to Excel",
+            command=self.export_email_list_file,
+            state=tk.DISABLED,
+            width=15
+        )
+        self.export_btn.pack(side=tk.LEFT, padx=(10, 0))
+        
         self.sync_status = ttk.Label(
             sync_btn_frame,
             text="",
@@ -326,6 +2689,24 @@ class IncentiveBatchManager:
         )
         self.assess_label2.pack(anchor=tk.W, pady=(5, 10))
         
+        # Send from memory: attach workbooks rendered at send time, no Create Files needed
+        memory_frame = ttk.Frame(assess_frame)
+        memory_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        self.memory_send_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            memory_frame,
+            text="Send from memory (skip the output folder)",
+            variable=self.memory_send_var
+        ).pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.archive_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(
+            memory_frame,
+            text="Archive copies in background",
+            variable=self.archive_var
+        ).pack(side=tk.LEFT)
+        
         self.assess_btn = ttk.Button(
             assess_frame,
             text="Run Email Assessment",
@@ -549,19 +2930,57 @@ class IncentiveBatchManager:
         bottom_frame = ttk.Frame(main_frame)
         bottom_frame.pack(fill=tk.X, pady=(10, 0))
         
-        ttk.Button(
+        self.reload_btn = ttk.Button(
             bottom_frame,
-            text="Reload All Data",
-            command=self.initial_load,
+            text="Reload Data",
+            command=self.reload_data,
             width=15
+        )
+        self.reload_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        # Reload source workbooks as soon as they are saved
+        self.watch_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(
+            bottom_frame,
+            text="Auto-reload changed files",
+            variable=self.watch_var
+        ).pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.cancel_btn = ttk.Button(
+            bottom_frame,
+            text="Cancel",
+            command=self.cancel_job,
+            width=10,
+            state=tk.DISABLED
+        )
+        self.cancel_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        ttk.Button(
+            bottom_frame,
+            text="Open Output Folder",
+            command=self.open_output_folder,
+            width=18
+        ).pack(side=tk.LEFT, padx=(0, 10))
+        
+        # Fan file generation out to all CPU cores
+        self.parallel_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(
+            bottom_frame,
+            text="Parallel file generation",
+            variable=self.parallel_var
         ).pack(side=tk.LEFT, padx=(0, 10))
         
-        ttk.Button(
+        ttk.Label(bottom_frame, text="Send via:").pack(side=tk.LEFT, padx=(0, 5))
+        self.mail_backend_var = tk.StringVar(value=MAIL_BACKENDS[self.mail_backend])
+        mail_backend_combo = ttk.Combobox(
             bottom_frame,
-            text="Open Output Folder",
-            command=self.open_output_folder,
-            width=18
-        ).pack(side=tk.LEFT)
+            textvariable=self.mail_backend_var,
+            values=list(MAIL_BACKENDS.values()),
+            state="readonly",
+            width=15
+        )
+        mail_backend_combo.pack(side=tk.LEFT)
+        mail_backend_combo.bind("<<ComboboxSelected>>", self.on_mail_backend_selected)
         
         ttk.Button(
             bottom_frame,
@@ -570,1356 +2989,762 @@ class IncentiveBatchManager:
             width=12
         ).pack(side=tk.RIGHT)
     
+    def on_mail_backend_selected(self, event=None):
+        """Switch the mail backend used by test and final sends."""
+        label = self.mail_backend_var.get()
+        self.mail_backend = next(key for key, value in MAIL_BACKENDS.items() if value == label)
+    
     # ==========================================
     # DATA LOADING
     # ==========================================
     
-    def clean_id(self, val):
-        """Clean ID values - remove .0 decimals, strip whitespace."""
-        if pd.isna(val):
-            return None
-        s = str(val).strip()
-        # Remove .0 suffix from float conversion
-        if s.endswith('.0'):
-            s = s[:-2]
-        # Try to normalize as integer
-        try:
-            s = str(int(float(s)))
-        except (ValueError, TypeError):
-            pass
-        return s
-    
     def initial_load(self):
-        """Load all data on startup."""
-        self.load_master_data()
-        self.load_email_list()
-        self.load_hierarchy_data()
-        
-        # Enable generate management reports button if data is loaded
-        if self.master_df is not None and self.hierarchy_df is not None:
-            self.gen_mgmt_btn.config(state=tk.NORMAL)
-    
-    def load_master_data(self):
-        """Load the Master Incentive Log."""
-        self.data_status.config(text="Loading Master Incentive Log...", style="Info.TLabel")
-        self.root.update()
-        
-        try:
-            if not self.source_path.exists():
-                self.data_status.config(
-                    text=f"Master file not found",
-                    style="Error.TLabel"
-                )
-                return
-            
-            # Create temp copy to avoid file lock
-            temp_dir = tempfile.gettempdir()
-            temp_file = Path(temp_dir) / "temp_master_incentive_log.xlsx"
-            
-            try:
-                shutil.copy2(self.source_path, temp_file)
-                self.master_df = pd.read_excel(temp_file)
-                temp_file.unlink()
-            except PermissionError:
-                self.data_status.config(
-                    text="File locked - close Excel and click 'Reload All Data'",
-                    style="Error.TLabel"
-                )
-                return
-            
-            # Get unique years
-            year_values = sorted(self.master_df['Batch Year'].dropna().unique().tolist(), reverse=True)
-            year_values = [str(int(y)) if isinstance(y, float) else str(y) for y in year_values]
-            
-            self.year_combo['values'] = year_values
-            
-            total_rows = len(self.master_df)
-            self.data_status.config(
-                text=f"✓ Loaded {total_rows:,} records | {len(year_values)} batch years",
-                style="Success.TLabel"
-            )
-            
-        except Exception as e:
-            self.data_status.config(
-                text=f"Error: {str(e)}",
-                style="Error.TLabel"
-            )
-    
-    def load_email_list(self):
-        """Load the email list."""
-        try:
-            if not self.email_list_path.exists():
-                self.email_status.config(
-                    text="Email list not found",
-                    style="Error.TLabel"
-                )
-                return
-            
-            self.email_df = pd.read_excel(self.email_list_path)
-            
-            # Clean ID columns (remove .0 decimals)
-            id_columns = ['SU01 Acct #', 'HR Supervisor #', 'HR 2nd Line Manager #']
-            for col in id_columns:
-                if col in self.email_df.columns:
-                    self.email_df[col] = self.email_df[col].apply(self.clean_id)
-            
-            record_count = len(self.email_df)
-            unique_ids = self.email_df['SU01 Acct #'].nunique() if 'SU01 Acct #' in self.email_df.columns else 0
-            
-            self.email_status.config(
-                text=f"✓ Loaded {record_count:,} records ({unique_ids:,} unique IDs)",
-                style="Success.TLabel"
-            )
-            
-        except Exception as e:
-            self.email_status.config(
-                text=f"Error: {str(e)}",
-                style="Error.TLabel"
-            )
-    
-    # ==========================================
-    # STAGE 1: BATCH SPLITTING
-    # ==========================================
+        """Load all three source workbooks."""
+        self.load_data(self.source_stamps())
     
-    def on_year_selected(self, event=None):
-        """Handle year selection."""
-        selected_year = self.year_var.get()
-        if not selected_year:
+    def reload_data(self):
+        """Reload only the source workbooks that changed since they last loaded."""
+        if self.pending_loads or self.current_job is not None:
             return
         
-        self.create_files_btn.config(state=tk.DISABLED)
-        self.assess_btn.config(state=tk.DISABLED)
-        self.test_btn.config(state=tk.DISABLED)
-        self.send_btn.config(state=tk.DISABLED)
-        
-        # Filter batch values
-        year_filter = self.master_df['Batch Year'].astype(str).str.contains(selected_year.split('.')[0])
-        filtered_df = self.master_df[year_filter]
-        
-        batch_values = filtered_df['Paid On Batch'].dropna().unique().tolist()
-        batch_values = sorted([str(b) for b in batch_values])
-        
-        self.batch_combo['values'] = batch_values
-        self.batch_var.set('')
-        
-        self.preview_label1.config(text=f"{len(batch_values)} batch dates available for {selected_year}")
-        self.preview_label2.config(text="")
-    
-    def on_batch_selected(self, event=None):
-        """Handle batch selection."""
-        self.create_files_btn.config(state=tk.DISABLED)
-        self.preview_label1.config(text="Selection changed. Click 'Run Analysis' to preview.")
-        self.preview_label2.config(text="")
-    
-    def filter_master_data(self, year, batch):
-        """Filter master dataframe by year and batch."""
-        year_match = self.master_df['Batch Year'].astype(str).str.startswith(year.split('.')[0])
-        batch_match = self.master_df['Paid On Batch'].astype(str) == batch
-        return self.master_df[year_match & batch_match]
+        changed = self.changed_sources()
+        if not changed:
+            messagebox.showinfo("Up to Date", "No source files have changed since they were loaded.")
+            return
+        self.load_data(changed)
     
-    def run_analysis(self):
-        """Run batch analysis/preview."""
-        year = self.year_var.get()
-        batch = self.batch_var.get()
-        
-        if not year or not batch:
-            messagebox.showinfo("Selection Required", "Please select both Batch Year and Paid On Batch")
+    def load_data(self, stamps):
+        """Read the given sources ({name: stamp}) concurrently on the load thread pool."""
+        if self.pending_loads or self.current_job is not None:
             return
         
-        filtered_df = self.filter_master_data(year, batch)
-        
-        if filtered_df.empty:
-            self.preview_label1.config(text="No records found for this selection", style="Warning.TLabel")
-            self.preview_label2.config(text="")
-            self.create_files_btn.config(state=tk.DISABLED)
-            return
+        loaders = {
+            'master': (self.read_master_data, self.on_master_loaded,
+                       self.data_status, "Loading Master Incentive Log..."),
+            'email': (self.read_email_list, self.on_email_list_loaded,
+                      self.email_status, "Loading email list..."),
+            'hierarchy': (self.read_hierarchy_data, self.on_hierarchy_loaded,
+                          self.hierarchy_status, "Loading hierarchy data...")
+        }
         
-        unique_reps = filtered_df['SalesPersonID'].nunique()
-        total_records = len(filtered_df)
-        total_payout = filtered_df['Payout'].sum() if 'Payout' in filtered_df.columns else 0
+        self.reload_btn.config(state=tk.DISABLED)
+        for name in stamps:
+            loaders[name][2].config(text=loaders[name][3], style="Info.TLabel")
         
-        self.selected_year = year
-        self.selected_batch = batch
+        # Start the parse pool from the Tk thread before the loaders need it
+        self.get_process_pool()
         
-        self.preview_label1.config(
-            text=f"Records: {total_records:,} | Unique Reps: {unique_reps} | Total Payout: ${total_payout:,.2f}"
-        )
-        self.preview_label2.config(
-            text=f"Ready to create {unique_reps} individual files. Click 'Create Files' to proceed."
-        )
+        self.seen_stamps.update(stamps)
+        self.reloaded_sources = []
+        self.pending_loads = len(stamps)
         
-        self.create_files_btn.config(state=tk.NORMAL)
+        for name, stamp in stamps.items():
+            reader, callback = loaders[name][:2]
+            future = self.load_executor.submit(reader)
+            future.add_done_callback(
+                lambda f, name=name, stamp=stamp, callback=callback:
+                    self.post_to_ui(self.finish_load, name, stamp, callback, f)
+            )
     
-    def format_excel_file(self, filepath):
-        """Format Excel file with styling."""
-        wb = load_workbook(filepath)
-        ws = wb.active
-        
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        header_alignment = Alignment(horizontal="center", vertical="center")
-        
-        for cell in ws[1]:
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = header_alignment
-        
-        headers = {cell.value: cell.column for cell in ws[1]}
-        
-        if 'Payout' in headers:
-            payout_col = headers['Payout']
-            for row in range(2, ws.max_row + 1):
-                ws.cell(row=row, column=payout_col).number_format = '"$"#,##0.00'
+    def finish_load(self, name, stamp, callback, future):
+        """Apply one finished load on the Tk thread."""
+        callback(future)
+        self.pending_loads -= 1
         
-        for col_name in ['Start Date', 'End Date']:
-            if col_name in headers:
-                col_idx = headers[col_name]
-                for row in range(2, ws.max_row + 1):
-                    ws.cell(row=row, column=col_idx).number_format = 'M/D/YYYY'
+        if future.exception() is None:
+            self.loaded_stamps[name] = stamp
+            self.reloaded_sources.append(name)
         
-        for col_idx in range(1, ws.max_column + 1):
-            max_length = 0
-            column_letter = get_column_letter(col_idx)
+        if self.pending_loads == 0:
+            if self.current_job is None:
+                self.reload_btn.config(state=tk.NORMAL)
             
-            for row in range(1, ws.max_row + 1):
-                cell = ws.cell(row=row, column=col_idx)
-                try:
-                    if cell.value:
-                        cell_length = len(str(cell.value))
-                        if max_length < cell_length:
-                            max_length = cell_length
-                except:
-                    pass
+            # Enable generate management reports button if data is loaded
+            if self.master_df is not None and self.hierarchy_df is not None:
+                self.gen_mgmt_btn.config(state=tk.NORMAL)
             
-            adjusted_width = min(max_length + 6, 60)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        wb.save(filepath)
+            self.refresh_derived(self.reloaded_sources)
     
-    def format_summary_file(self, filepath):
-        """Format summary Excel file."""
-        wb = load_workbook(filepath)
-        
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        header_alignment = Alignment(horizontal="center", vertical="center")
-        
-        for sheet_name in ['Rep Summary', 'Batch Info']:
-            ws = wb[sheet_name]
-            
-            for cell in ws[1]:
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = header_alignment
-            
-            if sheet_name == 'Rep Summary':
-                headers = {cell.value: cell.column for cell in ws[1]}
-                if 'Payout' in headers:
-                    payout_col = headers['Payout']
-                    for row in range(2, ws.max_row + 1):
-                        ws.cell(row=row, column=payout_col).number_format = '"$"#,##0.00'
-            
-            for col_idx in range(1, ws.max_column + 1):
-                max_length = 0
-                column_letter = get_column_letter(col_idx)
-                for row in range(1, ws.max_row + 1):
-                    cell = ws.cell(row=row, column=col_idx)
-                    try:
-                        if cell.value:
-                            cell_length = len(str(cell.value))
-                            if max_length < cell_length:
-                                max_length = cell_length
-                    except:
-                        pass
-                adjusted_width = min(max_length + 6, 60)
-                ws.column_dimensions[column_letter].width = adjusted_width
-        
-        wb.save(filepath)
+    def refresh_derived(self, sources):
+        """Re-run the preview and email assessments built from reloaded sources."""
+        if 'master' in sources and self.selected_batch:
+            if (self.year_var.get(), self.batch_var.get()) == (self.selected_year, self.selected_batch):
+                self.run_analysis()
+        
+        rep_inputs = {'email', 'master'} if self.memory_send_var.get() else {'email'}
+        if self.email_mapping and rep_inputs.intersection(sources):
+            self.run_email_assessment()
+        
+        if self.mgmt_email_mapping and 'email' in sources:
+            self.run_mgmt_email_assessment(notify=False)
     
-    def create_batch_files(self):
-        """Create individual files per SalesPersonID."""
-        year = self.selected_year
-        batch = self.selected_batch
+    def poll_sources(self):
+        """Check the source workbooks for changes on the load pool, then re-arm."""
+        if not self.watch_var.get():
+            self.root.after(SOURCE_POLL_MS, self.poll_sources)
+            return
         
-        if not year or not batch:
+        future = self.load_executor.submit(self.source_stamps)
+        future.add_done_callback(lambda f: self.post_to_ui(self.on_sources_polled, f))
+    
+    def on_sources_polled(self, future):
+        """Reload workbooks that changed since they were last read."""
+        self.root.after(SOURCE_POLL_MS, self.poll_sources)
+        try:
+            stamps = future.result()
+        except Exception:
             return
         
-        self.stage1_progress_var.set(0)
-        self.stage1_progress_label.config(text="Starting...")
-        self.root.update()
+        previous, self.polled_stamps = self.polled_stamps, stamps
+        if self.pending_loads or self.current_job is not None:
+            return
         
+        changed = {
+            name: stamp for name, stamp in stamps.items()
+            if stamp != self.seen_stamps.get(name) and stamp == previous.get(name)
+        }
+        if changed:
+            self.load_data(changed)
+    
+    def post_to_ui(self, callback, *args):
+        """Queue a callback to run on the Tk thread (safe from any thread)."""
+        self.ui_queue.put((callback, args))
+    
+    def poll_ui_queue(self):
+        """Run callbacks posted by worker threads, then re-arm the poll."""
         try:
-            filtered_df = self.filter_master_data(year, batch)
-            
-            if filtered_df.empty:
-                messagebox.showwarning("No Data", "No records found")
-                return
-            
-            # Create folder structure: year / batch / Individual Emails
-            year_folder = self.output_base / str(year).split('.')[0]
-            batch_folder_name = f"{batch}_{year}".replace("/", "-").replace("\\", "-")
-            batch_folder = year_folder / batch_folder_name
-            individual_folder = batch_folder / "Individual Emails"
-            
-            individual_folder.mkdir(parents=True, exist_ok=True)
-            
-            # Clear existing files in Individual Emails folder
-            for existing_file in individual_folder.glob("*.xlsx"):
-                existing_file.unlink()
-            
-            available_columns = [col for col in self.output_columns if col in filtered_df.columns]
-            
-            files_created = 0
-            total_records_written = 0
-            rep_summary = []
-            
-            grouped = list(filtered_df.groupby('SalesPersonID'))
-            total_reps = len(grouped)
-            
-            for idx, (sales_person_id, group_df) in enumerate(grouped):
-                progress_pct = ((idx + 1) / total_reps) * 100
-                self.stage1_progress_var.set(progress_pct)
-                self.stage1_progress_label.config(text=f"Creating file {idx + 1} of {total_reps}...")
-                self.root.update()
-                
-                rep_name = group_df['Rep Name'].iloc[0] if 'Rep Name' in group_df.columns else "Unknown"
-                rep_name_clean = str(rep_name).replace("/", "-").replace("\\", "-").replace(":", "-")
-                
-                batch_clean = str(batch).replace("/", "-").replace("\\", "-").replace(":", "-")
-                year_clean = str(year).split('.')[0]
-                
-                filename = f"{sales_person_id}_{rep_name_clean}_{batch_clean}_{year_clean}.xlsx"
-                filepath = individual_folder / filename
-                
-                output_df = group_df[available_columns].copy()
-                output_df.to_excel(filepath, index=False, sheet_name='Incentive Data')
-                
-                self.format_excel_file(filepath)
-                
-                files_created += 1
-                records = len(output_df)
-                total_records_written += records
-                payout = output_df['Payout'].sum() if 'Payout' in output_df.columns else 0
-                
-                rep_summary.append({
-                    'SalesPersonID': sales_person_id,
-                    'Rep Name': rep_name,
-                    'Records': records,
-                    'Payout': payout
-                })
-            
-            # Keep summary_df for the message but don't create file
-            summary_df = pd.DataFrame(rep_summary)
-            
-            self.stage1_progress_var.set(100)
-            self.stage1_progress_label.config(text=f"✓ Complete! {files_created} files created.")
-            
-            # Store for Stage 2
-            self.created_batch_folder = individual_folder
-            self.batch_files = [f for f in individual_folder.glob("*.xlsx") if not f.name.startswith("_")]
-            
-            # Enable Stage 2
-            self.assess_btn.config(state=tk.NORMAL)
-            self.assess_label1.config(text=f"Batch folder ready: {individual_folder.name} ({len(self.batch_files)} files)")
-            
-            messagebox.showinfo(
-                "Files Created",
-                f"BATCH SPLIT COMPLETE\n\n"
-                f"Files Created: {files_created}\n"
-                f"Total Records: {total_records_written:,}\n"
-                f"Total Payout: ${summary_df['Payout'].sum():,.2f}\n\n"
-                f"Location:\n{individual_folder}"
-            )
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to create files:\n{str(e)}")
-            self.stage1_progress_label.config(text=f"Error: {str(e)}")
+            while True:
+                callback, args = self.ui_queue.get_nowait()
+                callback(*args)
+        except queue.Empty:
+            pass
+        finally:
+            self.root.after(50, self.poll_ui_queue)
     
-    # ==========================================
-    # STAGE 2: EMAIL DISTRIBUTION
-    # ==========================================
+    def shutdown_workers(self):
+        """Stop the load and job threads and worker processes on exit."""
+        if self.current_job is not None:
+            self.current_job.cancel()
+        self.load_executor.shutdown(wait=False, cancel_futures=True)
+        self.job_executor.shutdown(wait=False, cancel_futures=True)
+        super().shutdown_workers()
     
-    def browse_zrepcheck(self):
-        """Browse for ZREPCHECKNEW file."""
-        filepath = filedialog.askopenfilename(
-            title="Select ZREPCHECKNEW File",
-            filetypes=[("Excel files", "*.xlsx *.xls"), ("All files", "*.*")],
-            initialdir=str(self.output_base)
-        )
+    def start_job(self, work, on_done, *args):
+        """Run work(job, *args) on the job thread; returns the BackgroundJob, or None if one is running."""
+        if self.current_job is not None:
+            messagebox.showinfo("Busy", "Another operation is still running")
+            return None
         
-        if filepath:
-            self.zrepcheck_path = Path(filepath)
-            self.zrep_label.config(text=self.zrepcheck_path.name)
-            self.sync_btn.config(state=tk.NORMAL)
-    
-    def sync_email_list(self):
-        """Sync ZREPCHECKNEW into EmailList."""
-        if not hasattr(self, 'zrepcheck_path') or not self.zrepcheck_path.exists():
-            messagebox.showerror("Error", "Please select a valid ZREPCHECKNEW file")
-            return
+        job = BackgroundJob(self.post_to_ui)
+        self.current_job = job
+        self.cancel_btn.config(state=tk.NORMAL)
+        self.reload_btn.config(state=tk.DISABLED)
         
-        if self.email_df is None:
-            messagebox.showerror("Error", "Email list not loaded")
+        future = self.job_executor.submit(work, job, *args)
+        future.add_done_callback(lambda f: self.post_to_ui(self.finish_job, on_done, f))
+        return job
+    
+    def finish_job(self, on_done, future):
+        """Hand a finished job to its completion callback on the Tk thread."""
+        self.current_job = None
+        self.cancel_btn.config(state=tk.DISABLED)
+        if not self.pending_loads:
+            self.reload_btn.config(state=tk.NORMAL)
+        on_done(future)
+    
+    def cancel_job(self):
+        """Ask the running job to stop after its current item."""
+        if self.current_job is not None:
+            self.current_job.cancel()
+            self.cancel_btn.config(state=tk.DISABLED)
+    
+    def on_progress(self, stage, value, maximum, text):
+        """Draw stage progress (posted from the job thread)."""
+        if stage == 3:
+            self.stage3_progress['maximum'] = maximum
+            self.stage3_progress['value'] = value
+            self.stage3_progress_label.config(text=text)
             return
         
+        progress_var, progress_label = {
+            1: (self.stage1_progress_var, self.stage1_progress_label),
+            2: (self.stage2_progress_var, self.stage2_progress_label)
+        }[stage]
+        progress_var.set((value / maximum) * 100 if maximum else 0)
+        progress_label.config(text=text)
+    
+    def warn(self, title, message):
+        """Show a warning box on the Tk thread (safe from any thread)."""
+        self.post_to_ui(messagebox.showwarning, title, message)
+    
+    def on_master_loaded(self, future):
+        """Show the Master Incentive Log load result."""
         try:
-            self.sync_status.config(text="Syncing...", style="Info.TLabel")
-            self.root.update()
-            
-            zrep_df = pd.read_excel(self.zrepcheck_path)
-            
-            # Clean ID columns in new data (remove .0 decimals)
-            id_columns = ['SU01 Acct #', 'HR Supervisor #', 'HR 2nd Line Manager #']
-            for col in id_columns:
-                if col in zrep_df.columns:
-                    zrep_df[col] = zrep_df[col].apply(self.clean_id)
-            
-            # Also ensure existing email_df has clean IDs
-            for col in id_columns:
-                if col in self.email_df.columns:
-                    self.email_df[col] = self.email_df[col].apply(self.clean_id)
-            
-            initial_count = len(self.email_df)
-            
-            combined_df = pd.concat([self.email_df, zrep_df], ignore_index=True)
-            combined_df = combined_df.drop_duplicates(subset=['SU01 Acct #'], keep='first')
-            
-            new_records = len(combined_df) - initial_count
-            
-            combined_df.to_excel(self.email_list_path, index=False)
-            self.email_df = combined_df
-            
-            self.sync_status.config(
-                text=f"✓ Added {new_records} new records",
-                style="Success.TLabel"
-            )
-            
-            self.email_status.config(
-                text=f"✓ Loaded {len(combined_df):,} records ({combined_df['SU01 Acct #'].nunique():,} unique IDs)",
-                style="Success.TLabel"
+            master_df, batch_index, batch_cube, from_cache = future.result()
+        except FileNotFoundError:
+            self.data_status.config(
+                text=f"Master file not found",
+                style="Error.TLabel"
+            )
+            return
+        except PermissionError:
+            self.data_status.config(
+                text="File locked - close Excel and click 'Reload Data'",
+                style="Error.TLabel"
             )
-            
-            messagebox.showinfo("Sync Complete", f"Added {new_records} new records.\nTotal: {len(combined_df):,}")
-            
-        except Exception as e:
-            self.sync_status.config(text=f"Error: {str(e)}", style="Error.TLabel")
-    
-    def run_email_assessment(self):
-        """Run email assessment."""
-        if not self.batch_files:
-            messagebox.showinfo("No Files", "Create batch files first")
-            return
-        
-        if self.email_df is None:
-            messagebox.showinfo("No Email List", "Load email list first")
             return
-        
-        try:
-            self.email_mapping = {}
-            self.missing_emails = []
-            
-            total_files = len(self.batch_files)
-            matched = 0
-            missing = 0
-            
-            # Create lookup
-            email_lookup = {}
-            for _, row in self.email_df.iterrows():
-                acct_id = str(row.get('SU01 Acct #', '')).strip()
-                email = str(row.get('SU01 Email', '')).strip()
-                name = str(row.get('SU01 Name', '')).strip()
-                
-                if acct_id and acct_id != 'nan':
-                    email_lookup[acct_id] = {
-                        'email': email if email and email != 'nan' else None,
-                        'name': name if name and name != 'nan' else 'Unknown'
-                    }
-            
-            for file_path in self.batch_files:
-                filename = file_path.stem
-                parts = filename.split('_')
-                
-                if parts:
-                    sales_person_id = str(parts[0]).strip()
-                    
-                    if sales_person_id in email_lookup:
-                        email_info = email_lookup[sales_person_id]
-                        
-                        if email_info['email'] and '@' in email_info['email']:
-                            self.email_mapping[sales_person_id] = {
-                                'file': file_path,
-                                'email': email_info['email'],
-                                'name': email_info['name']
-                            }
-                            matched += 1
-                        else:
-                            self.missing_emails.append({
-                                'SalesPersonID': sales_person_id,
-                                'File': file_path.name,
-                                'Reason': 'Invalid/missing email'
-                            })
-                            missing += 1
-                    else:
-                        self.missing_emails.append({
-                            'SalesPersonID': sales_person_id,
-                            'File': file_path.name,
-                            'Reason': 'ID not in email list'
-                        })
-                        missing += 1
-            
-            if missing == 0:
-                self.assess_label1.config(
-                    text=f"✓ All {total_files} files have valid email addresses!",
-                    style="Success.TLabel"
-                )
-                self.assess_label2.config(text="Ready to send emails.")
-            else:
-                self.assess_label1.config(
-                    text=f"⚠ {matched} of {total_files} files have valid emails. {missing} missing.",
-                    style="Warning.TLabel"
-                )
-                
-                missing_text = "Missing: "
-                for item in self.missing_emails[:5]:
-                    missing_text += f"{item['SalesPersonID']} ({item['Reason']}), "
-                if len(self.missing_emails) > 5:
-                    missing_text += f"... +{len(self.missing_emails) - 5} more"
-                
-                self.assess_label2.config(text=missing_text.rstrip(", "))
-            
-            if matched > 0:
-                self.test_btn.config(state=tk.NORMAL)
-                self.send_btn.config(state=tk.NORMAL)
-            
         except Exception as e:
-            self.assess_label1.config(text=f"Error: {str(e)}", style="Error.TLabel")
-    
-    def get_batch_display_info(self):
-        """Parse batch info for email content."""
-        if not self.selected_batch:
-            return "Unknown", "Unknown"
+            self.data_status.config(
+                text=f"Error: {str(e)}",
+                style="Error.TLabel"
+            )
+            return
         
-        batch_date = self.selected_batch
-        batch_year = self.selected_year or ""
+        self.master_df = master_df
+        self.batch_index = batch_index
+        self.batch_cube = batch_cube
+        self.batch_frame_cache = {}
         
-        try:
-            date_parts = batch_date.replace("-", "/").split("/")
-            if len(date_parts) >= 1:
-                month_num = int(date_parts[0])
-                month_names = ['January', 'February', 'March', 'April', 'May', 'June',
-                               'July', 'August', 'September', 'October', 'November', 'December']
-                batch_month = month_names[month_num - 1] if 1 <= month_num <= 12 else batch_date
-            else:
-                batch_month = batch_date
-        except:
-            batch_month = batch_date
+        year_values = sorted(self.batch_cube['batches'].keys(), reverse=True)
+        self.year_combo['values'] = year_values
         
-        return batch_month, batch_year
+        total_rows = len(self.master_df)
+        self.data_status.config(
+            text=f"✓ Loaded {total_rows:,} records | {len(year_values)} batch years"
+                 f"{' (cached)' if from_cache else ''}",
+            style="Success.TLabel"
+        )
     
-    def create_email(self, outlook, recipient, sales_person_id, sales_person_name, 
-                     file_path, batch_month, batch_year, is_test=False, test_email=None):
-        """Create an Outlook email."""
-        mail = outlook.CreateItem(0)
-        
-        mail.SentOnBehalfOfName = self.sender_email
+    def on_email_list_loaded(self, future):
+        """Show the email list load result."""
+        try:
+            self.email_index = future.result()
+        except FileNotFoundError:
+            self.email_status.config(
+                text="Email list not found",
+                style="Error.TLabel"
+            )
+            return
+        except Exception as e:
+            self.email_status.config(
+                text=f"Error: {str(e)}",
+                style="Error.TLabel"
+            )
+            return
         
-        if is_test:
-            mail.To = test_email
-        else:
-            mail.To = recipient
-            mail.CC = self.cc_email
+        self.email_status.config(
+            text=f"✓ Loaded {len(self.email_index):,} unique IDs",
+            style="Success.TLabel"
+        )
+        self.export_btn.config(state=tk.NORMAL)
+    
+    def on_hierarchy_loaded(self, future):
+        """Show the hierarchy load result."""
+        try:
+            self.hierarchy_df, self.hierarchy_index = future.result()
+        except FileNotFoundError:
+            self.hierarchy_status.config(
+                text="Hierarchy file not found",
+                style="Error.TLabel"
+            )
+            return
+        except Exception as e:
+            self.hierarchy_status.config(
+                text=f"Error: {str(e)}",
+                style="Error.TLabel"
+            )
+            return
         
-        batch_display = f"{batch_month} {batch_year}".strip()
-        mail.Subject = f"Incentive Detail Report and Payout Information - {batch_display} - {sales_person_id}"
+        self.hierarchy_status.config(
+            text=f"✓ Loaded {len(self.hierarchy_df):,} records",
+            style="Success.TLabel"
+        )
+    
+    # ==========================================
+    # STAGE 1: BATCH SPLITTING
+    # ==========================================
+    
+    def on_year_selected(self, event=None):
+        """Handle year selection."""
+        selected_year = self.year_var.get()
+        if not selected_year:
+            return
         
-        if is_test:
-            mail.Subject = f"[TEST] {mail.Subject}"
+        self.create_files_btn.config(state=tk.DISABLED)
+        self.assess_btn.config(state=tk.DISABLED)
+        self.test_btn.config(state=tk.DISABLED)
+        self.send_btn.config(state=tk.DISABLED)
         
-        body = f"""{sales_person_name} ({sales_person_id}) -
-
-Attached is your incentive detail report for the {batch_month} {batch_year} payment. This report details the specific incentives you earned during this pay period.
-
-If you have questions about the calculation of your final payout or any other aspect of your incentive details, please contact the CA Analytics Team - CAAnalyticsAll@breakthrubev.com
-
--Analytics Team"""
+        # Batch values come straight from the batch cube
+        batch_values = sorted(self.batch_cube.get('batches', {}).get(selected_year, {}).keys())
         
-        mail.Body = body
-        mail.Attachments.Add(str(file_path))
+        self.batch_combo['values'] = batch_values
+        self.batch_var.set('')
         
-        return mail
+        self.preview_label1.config(text=f"{len(batch_values)} batch dates available for {selected_year}")
+        self.preview_label2.config(text="")
     
-    def send_test_emails(self):
-        """Send 3 random test emails."""
-        if not OUTLOOK_AVAILABLE:
-            messagebox.showerror("Outlook Not Available", "pywin32 is required for Outlook integration")
+    def on_batch_selected(self, event=None):
+        """Handle batch selection."""
+        self.create_files_btn.config(state=tk.DISABLED)
+        self.preview_label1.config(text="Selection changed. Click 'Run Analysis' to preview.")
+        self.preview_label2.config(text="")
+    
+    def run_analysis(self):
+        """Run batch analysis/preview."""
+        year = self.year_var.get()
+        batch = self.batch_var.get()
+        
+        if not year or not batch:
+            messagebox.showinfo("Selection Required", "Please select both Batch Year and Paid On Batch")
             return
         
-        test_email = self.test_email_var.get().strip()
+        summary = self.batch_summary(year, batch)
         
-        if not test_email or '@' not in test_email:
-            messagebox.showerror("Invalid Email", "Please enter a valid test email address")
+        if summary is None:
+            self.preview_label1.config(text="No records found for this selection", style="Warning.TLabel")
+            self.preview_label2.config(text="")
+            self.create_files_btn.config(state=tk.DISABLED)
             return
         
-        if len(self.email_mapping) < 3:
-            messagebox.showerror("Not Enough Files", "Need at least 3 files with valid emails")
-            return
+        unique_reps = summary['reps']
+        total_records = summary['rows']
+        total_payout = summary['payout']
         
-        try:
-            self.test_status.config(text="Sending...", style="Info.TLabel")
-            self.root.update()
-            
-            random_ids = random.sample(list(self.email_mapping.keys()), 3)
-            batch_month, batch_year = self.get_batch_display_info()
-            
-            outlook = win32.Dispatch('Outlook.Application')
-            
-            for sales_person_id in random_ids:
-                info = self.email_mapping[sales_person_id]
-                
-                mail = self.create_email(
-                    outlook=outlook,
-                    recipient=info['email'],
-                    sales_person_id=sales_person_id,
-                    sales_person_name=info['name'],
-                    file_path=info['file'],
-                    batch_month=batch_month,
-                    batch_year=batch_year,
-                    is_test=True,
-                    test_email=test_email
-                )
-                
-                mail.Send()
-            
-            self.test_status.config(
-                text=f"✓ 3 test emails sent to {test_email}",
-                style="Success.TLabel"
-            )
-            
-            messagebox.showinfo(
-                "Test Complete",
-                f"3 test emails sent to:\n{test_email}\n\n"
-                f"SalesPersonIDs:\n• {random_ids[0]}\n• {random_ids[1]}\n• {random_ids[2]}"
-            )
-            
-        except Exception as e:
-            self.test_status.config(text=f"Error: {str(e)}", style="Error.TLabel")
-            messagebox.showerror("Test Error", f"Failed:\n{str(e)}")
+        self.selected_year = year
+        self.selected_batch = batch
+        
+        self.preview_label1.config(
+            text=f"Records: {total_records:,} | Unique Reps: {unique_reps} | Total Payout: ${total_payout:,.2f}"
+        )
+        self.preview_label2.config(
+            text=f"Ready to create {unique_reps} individual files. Click 'Create Files' to proceed."
+        )
+        
+        self.create_files_btn.config(state=tk.NORMAL)
+        self.assess_btn.config(state=tk.NORMAL)
     
-    def send_final_emails(self):
-        """Send all final emails."""
-        if not OUTLOOK_AVAILABLE:
-            messagebox.showerror("Outlook Not Available", "pywin32 is required")
-            return
+    def create_batch_files(self):
+        """Create individual files per SalesPersonID on the job thread."""
+        year = self.selected_year
+        batch = self.selected_batch
         
-        if not self.email_mapping:
-            messagebox.showerror("No Emails", "Run assessment first")
+        if not year or not batch:
             return
         
-        total_emails = len(self.email_mapping)
+        filtered_df = self.filter_master_data(year, batch)
         
-        if not messagebox.askyesno(
-            "Confirm Send",
-            f"Send {total_emails} emails?\n\n"
-            f"Batch: {self.created_batch_folder.name if self.created_batch_folder else 'Unknown'}\n"
-            f"CC: {self.cc_email}"
-        ):
+        if filtered_df.empty:
+            messagebox.showwarning("No Data", "No records found")
             return
         
-        try:
-            batch_month, batch_year = self.get_batch_display_info()
-            outlook = win32.Dispatch('Outlook.Application')
-            
-            sent_emails = []
-            failed_emails = []
-            
-            for idx, (sales_person_id, info) in enumerate(self.email_mapping.items()):
-                progress_pct = ((idx + 1) / total_emails) * 100
-                self.stage2_progress_var.set(progress_pct)
-                self.stage2_progress_label.config(text=f"Sending {idx + 1} of {total_emails}...")
-                self.root.update()
-                
-                try:
-                    mail = self.create_email(
-                        outlook=outlook,
-                        recipient=info['email'],
-                        sales_person_id=sales_person_id,
-                        sales_person_name=info['name'],
-                        file_path=info['file'],
-                        batch_month=batch_month,
-                        batch_year=batch_year,
-                        is_test=False
-                    )
-                    
-                    mail.Send()
-                    
-                    sent_emails.append({
-                        'SalesPersonID': sales_person_id,
-                        'Name': info['name'],
-                        'Email': info['email'],
-                        'File': info['file'].name,
-                        'Status': '✓ Sent'
-                    })
-                    
-                except Exception as e:
-                    failed_emails.append({
-                        'SalesPersonID': sales_person_id,
-                        'Name': info['name'],
-                        'Email': info['email'],
-                        'File': info['file'].name,
-                        'Status': f'✗ Failed: {str(e)}'
-                    })
-            
-            self.stage2_progress_var.set(100)
-            self.stage2_progress_label.config(text=f"✓ Complete! {len(sent_emails)} sent.")
-            
-            self.send_recap_email(outlook, sent_emails, failed_emails, batch_month, batch_year)
-            
-            self.send_status.config(
-                text=f"✓ {len(sent_emails)} sent, {len(failed_emails)} failed",
-                style="Success.TLabel" if not failed_emails else "Warning.TLabel"
-            )
-            
-            messagebox.showinfo(
-                "Send Complete",
-                f"Email distribution complete!\n\n"
-                f"Sent: {len(sent_emails)}\n"
-                f"Failed: {len(failed_emails)}\n\n"
-                f"Recap sent to:\n• {self.recap_recipients[0]}\n• {self.recap_recipients[1]}"
-            )
-            
-        except Exception as e:
-            self.stage2_progress_label.config(text=f"Error: {str(e)}")
-            messagebox.showerror("Send Error", f"Failed:\n{str(e)}")
+        job = self.start_job(
+            self.split_batch, self.on_batch_files_created,
+            year, batch, filtered_df, self.parallel_var.get()
+        )
+        if job:
+            self.stage1_progress_var.set(0)
+            self.stage1_progress_label.config(text="Starting...")
     
-    def send_recap_email(self, outlook, sent_emails, failed_emails, batch_month, batch_year):
-        """Send recap email."""
+    def on_batch_files_created(self, future):
+        """Show the batch split result."""
         try:
-            mail = outlook.CreateItem(0)
-            
-            mail.SentOnBehalfOfName = self.sender_email
-            mail.To = "; ".join(self.recap_recipients)
-            
-            batch_display = f"{batch_month} {batch_year}".strip()
-            mail.Subject = f"Incentive Email Distribution Recap - {batch_display}"
-            
-            total_sent = len(sent_emails)
-            total_failed = len(failed_emails)
-            success_rate = (total_sent / (total_sent + total_failed) * 100) if (total_sent + total_failed) > 0 else 0
-            
-            body = f"""INCENTIVE EMAIL DISTRIBUTION RECAP
-{'='*50}
-
-Batch: {self.created_batch_folder.name if self.created_batch_folder else 'Unknown'}
-Date Sent: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-SUMMARY
-{'-'*30}
-Total Emails Sent: {total_sent}
-Total Failed: {total_failed}
-Success Rate: {success_rate:.1f}%
-
-
-DETAILED SEND LOG
-{'-'*30}
-"""
-            
-            for item in sent_emails:
-                body += f"✓ {item['SalesPersonID']} | {item['Name']} | {item['Email']}\n"
-            
-            if failed_emails:
-                body += f"""
-
-FAILED SENDS
-{'-'*30}
-"""
-                for item in failed_emails:
-                    body += f"✗ {item['SalesPersonID']} | {item['Name']} | {item['Status']}\n"
-            
-            body += f"""
-
-{'='*50}
-Automated recap from Incentive Batch Manager
-"""
-            
-            mail.Body = body
-            mail.Send()
-            
+            result = future.result()
+        except JobCancelled:
+            self.stage1_progress_label.config(text="Cancelled - run Create Files again to finish the batch")
+            return
         except Exception as e:
-            messagebox.showwarning("Recap Warning", f"Emails sent but recap failed:\n{str(e)}")
-    
-    def open_output_folder(self):
-        """Open the output folder."""
-        if self.created_batch_folder and self.created_batch_folder.exists():
-            os.startfile(self.created_batch_folder)
-        else:
-            os.startfile(self.output_base)
+            messagebox.showerror("Error", f"Failed to create files:\n{str(e)}")
+            self.stage1_progress_label.config(text=f"Error: {str(e)}")
+            return
+        
+        individual_folder = result['folder']
+        
+        self.stage1_progress_var.set(100)
+        self.stage1_progress_label.config(
+            text=f"✓ Complete! {result['files_created']} files created, "
+                 f"{result['unchanged']} unchanged, {result['removed']} removed."
+        )
+        
+        # Store for Stage 2
+        self.created_batch_folder = individual_folder
+        self.batch_files = result['manifest']
+        
+        # Enable Stage 2
+        self.assess_btn.config(state=tk.NORMAL)
+        self.assess_label1.config(text=f"Batch folder ready: {individual_folder.name} ({len(self.batch_files)} files)")
+        
+        messagebox.showinfo(
+            "Files Created",
+            f"BATCH SPLIT COMPLETE\n\n"
+            f"Files Created: {result['files_created']}\n"
+            f"Files Unchanged: {result['unchanged']}\n"
+            f"Files Removed: {result['removed']}\n"
+            f"Total Records: {result['total_records']:,}\n"
+            f"Total Payout: ${result['total_payout']:,.2f}\n\n"
+            f"Location:\n{individual_folder}"
+        )
     
     # ==========================================
-    # STAGE 3: MANAGEMENT REPORTING
+    # STAGE 2: EMAIL DISTRIBUTION
     # ==========================================
     
-    def load_hierarchy_data(self):
-        """Load the CA_Sales_Detail hierarchy file."""
-        try:
-            if not self.hierarchy_path.exists():
-                self.hierarchy_status.config(
-                    text="Hierarchy file not found",
-                    style="Error.TLabel"
-                )
-                return False
-            
-            self.hierarchy_df = pd.read_excel(self.hierarchy_path)
-            
-            # Clean all ID columns
-            id_columns = [
-                'Sales Person ID', 'Field Sales Manager ID', 
-                'Area Manager ID', 'Division Manager ID', 'Vice President ID'
-            ]
-            for col in id_columns:
-                if col in self.hierarchy_df.columns:
-                    self.hierarchy_df[col] = self.hierarchy_df[col].apply(self.clean_id)
-            
-            # Filter to valid Division Manager Position IDs
-            valid_dm_positions = ['40064102', '40064095', '40064096', '40064098', '40064471', '40064097', '40070873']
-            self.hierarchy_df['Division Manager Position ID'] = self.hierarchy_df['Division Manager Position ID'].astype(str).str.strip()
-            before_count = len(self.hierarchy_df)
-            self.hierarchy_df = self.hierarchy_df[
-                self.hierarchy_df['Division Manager Position ID'].isin(valid_dm_positions)
-            ].copy()
-            
-            # Filter out unassigned FSMs
-            self.hierarchy_df = self.hierarchy_df[
-                self.hierarchy_df['Field Sales Manager ID'].notna()
-            ].copy()
-            
-            self.hierarchy_status.config(
-                text=f"✓ Loaded {len(self.hierarchy_df):,} records",
-                style="Success.TLabel"
-            )
-            
-            return True
-            
-        except Exception as e:
-            self.hierarchy_status.config(
-                text=f"Error: {str(e)}",
-                style="Error.TLabel"
-            )
-            return False
+    def browse_zrepcheck(self):
+        """Browse for ZREPCHECKNEW file."""
+        filepath = filedialog.askopenfilename(
+            title="Select ZREPCHECKNEW File",
+            filetypes=[("Excel files", "*.xlsx *.xls"), ("All files", "*.*")],
+            initialdir=str(self.output_base)
+        )
+        
+        if filepath:
+            self.zrepcheck_path = Path(filepath)
+            self.zrep_label.config(text=self.zrepcheck_path.name)
+            self.sync_btn.config(state=tk.NORMAL)
     
-    def generate_management_reports(self):
-        """Generate management rollup reports."""
-        if self.master_df is None or self.hierarchy_df is None:
-            messagebox.showinfo("Data Required", "Please ensure all data is loaded")
+    def sync_email_list(self):
+        """Sync ZREPCHECKNEW into EmailList."""
+        if not hasattr(self, 'zrepcheck_path') or not self.zrepcheck_path.exists():
+            messagebox.showerror("Error", "Please select a valid ZREPCHECKNEW file")
             return
         
-        year = self.year_var.get()
-        batch = self.batch_var.get()
-        
-        if not year or not batch:
-            messagebox.showinfo("Selection Required", "Please select a batch first in Stage 1")
+        if not self.email_index:
+            messagebox.showerror("Error", "Email list not loaded")
             return
         
         try:
-            self.mgmt_gen_status.config(text="Generating...", style="Info.TLabel")
+            self.sync_status.config(text="Syncing...", style="Info.TLabel")
             self.root.update()
             
-            # Filter batch data
-            batch_df = self.filter_master_data(year, batch).copy()
-            batch_df['SalesPersonID'] = batch_df['SalesPersonID'].apply(self.clean_id)
-            
-            # Get incentive IDs
-            incentive_ids = set(x for x in batch_df['SalesPersonID'].unique() if x is not None)
-            hierarchy_ids = set(x for x in self.hierarchy_df['Sales Person ID'].dropna().unique() if x is not None)
+            inserted, updated = self.sync_email_directory(self.zrepcheck_path)
+            pending = self.pending_email_export()
             
-            matched_ids = incentive_ids & hierarchy_ids
-            unmatched_ids = incentive_ids - hierarchy_ids
-            
-            coverage_pct = len(matched_ids) / len(incentive_ids) * 100 if incentive_ids else 0
-            self.mgmt_coverage_label.config(
-                text=f"Coverage: {len(matched_ids)} of {len(incentive_ids)} matched ({coverage_pct:.1f}%), {len(unmatched_ids)} unmatched",
-                style="Success.TLabel" if coverage_pct > 90 else "Warning.TLabel"
+            self.sync_status.config(
+                text=f"✓ Added {len(inserted)} new, updated {len(updated)}"
+                     f"{f' ({pending} not exported)' if pending else ''}",
+                style="Success.TLabel"
             )
             
-            # Create output folder: year / batch / Management Reports
-            year_clean = str(year).split('.')[0]
-            batch_folder_name = f"{batch}_{year}".replace("/", "-").replace("\\", "-")
-            output_folder = self.output_base / year_clean / batch_folder_name / "Management Reports"
-            output_folder.mkdir(parents=True, exist_ok=True)
-            
-            # Clear old reports
-            for f in output_folder.glob("*.xlsx"):
-                f.unlink()
-            
-            self.mgmt_reports = []
-            
-            # Manager levels
-            levels = [
-                ('VP', 'Vice President ID', 'Vice President Name'),
-                ('DIRECTOR', 'Division Manager ID', 'Division Manager Name'),
-                ('AM', 'Area Manager ID', 'Area Manager Name'),
-                ('FSM', 'Field Sales Manager ID', 'Field Sales Manager Name')
-            ]
-            
-            total_managers = 0
-            for level_code, id_col, name_col in levels:
-                managers = self.hierarchy_df[[id_col, name_col]].drop_duplicates()
-                for _, row in managers.iterrows():
-                    mgr_id = row[id_col]
-                    if pd.isna(mgr_id) or mgr_id in ['UNASSIGNED', None]:
-                        continue
-                    
-                    # Check if manager has anyone with incentives
-                    team = self.hierarchy_df[self.hierarchy_df[id_col] == mgr_id]
-                    team_ids = set(team['Sales Person ID'].dropna().unique())
-                    
-                    if team_ids & incentive_ids:
-                        total_managers += 1
-            
-            self.stage3_progress['maximum'] = total_managers
-            self.stage3_progress['value'] = 0
-            
-            created = 0
-            for level_code, id_col, name_col in levels:
-                managers = self.hierarchy_df[[id_col, name_col]].drop_duplicates()
-                
-                for _, row in managers.iterrows():
-                    mgr_id = row[id_col]
-                    mgr_name = row[name_col]
-                    
-                    if pd.isna(mgr_id) or mgr_id in ['UNASSIGNED', None]:
-                        continue
-                    
-                    # Check if manager has anyone with incentives
-                    team = self.hierarchy_df[self.hierarchy_df[id_col] == mgr_id]
-                    team_ids = set(team['Sales Person ID'].dropna().unique())
-                    
-                    if not (team_ids & incentive_ids):
-                        continue
-                    
-                    filepath = self.create_manager_report(
-                        level_code, mgr_id, mgr_name,
-                        batch_df, year, batch, output_folder
-                    )
-                    
-                    if filepath:
-                        self.mgmt_reports.append({
-                            'level': level_code,
-                            'id': mgr_id,
-                            'name': mgr_name,
-                            'filepath': filepath
-                        })
-                        created += 1
-                    
-                    self.stage3_progress['value'] += 1
-                    self.stage3_progress_label.config(text=f"Creating report {created}...")
-                    self.root.update()
-            
-            self.mgmt_gen_status.config(
-                text=f"✓ Created {created} reports",
+            self.email_status.config(
+                text=f"✓ Loaded {len(self.email_index):,} unique IDs",
                 style="Success.TLabel"
             )
-            self.stage3_progress_label.config(text=f"Complete: {created} management reports")
             
-            # Enable assessment button
-            if self.mgmt_reports:
-                self.mgmt_assess_btn.config(state=tk.NORMAL)
-            
-            # Store output folder
-            self.mgmt_output_folder = output_folder
-            
-            # Create Master Management Summary Report
-            self.create_master_summary_report(batch_df, year, batch, output_folder)
+            messagebox.showinfo(
+                "Sync Complete",
+                f"Added {len(inserted)} new records, updated {len(updated)}.\n"
+                f"Total: {len(self.email_index):,}\n\n"
+                f"Use 'Export to Excel' to write the changes to {self.email_list_path.name}."
+            )
             
         except Exception as e:
-            self.mgmt_gen_status.config(text=f"Error: {str(e)}", style="Error.TLabel")
-            messagebox.showerror("Error", f"Failed to generate reports:\n{str(e)}")
+            self.sync_status.config(text=f"Error: {str(e)}", style="Error.TLabel")
     
-    def create_manager_report(self, manager_level, manager_id, manager_name, batch_df, batch_year, paid_on_batch, output_folder):
-        """Create a multi-tab report for a manager."""
-        level_config = {
-            'VP': {'id_col': 'Vice President ID', 'include_levels': ['DIRECTOR', 'AM', 'FSM', 'REP']},
-            'DIRECTOR': {'id_col': 'Division Manager ID', 'include_levels': ['AM', 'FSM', 'REP']},
-            'AM': {'id_col': 'Area Manager ID', 'include_levels': ['FSM', 'REP']},
-            'FSM': {'id_col': 'Field Sales Manager ID', 'include_levels': ['REP']}
-        }
-        
-        config = level_config[manager_level]
-        
-        team_hierarchy = self.hierarchy_df[
-            self.hierarchy_df[config['id_col']] == manager_id
-        ].copy()
-        
-        if team_hierarchy.empty:
-            return None
-        
-        level_id_cols = {
-            'DIRECTOR': 'Division Manager ID', 'AM': 'Area Manager ID',
-            'FSM': 'Field Sales Manager ID', 'REP': 'Sales Person ID'
-        }
-        level_labels = {'DIRECTOR': 'Director', 'AM': 'Area Mgr', 'FSM': 'FSM', 'REP': 'Rep'}
-        
-        # Hierarchy level order (for determining what columns to show)
-        level_order = ['VP', 'DIRECTOR', 'AM', 'FSM', 'REP']
-        manager_level_idx = level_order.index(manager_level)
-        
-        # Build lookups for each level type
-        # For REPs: lookup by Sales Person ID
-        rep_lookup = {}
-        for _, row in team_hierarchy.iterrows():
-            rep_id = row.get('Sales Person ID')
-            if rep_id:
-                rep_lookup[rep_id] = {
-                    'Director': row.get('Division Manager Name', ''),
-                    'Area Manager': row.get('Area Manager Name', ''),
-                    'FSM': row.get('Field Sales Manager Name', '')
-                }
-        
-        # For FSMs: lookup by Field Sales Manager ID
-        fsm_lookup = {}
-        for _, row in team_hierarchy.drop_duplicates(subset=['Field Sales Manager ID']).iterrows():
-            fsm_id = row.get('Field Sales Manager ID')
-            if fsm_id:
-                fsm_lookup[fsm_id] = {
-                    'Director': row.get('Division Manager Name', ''),
-                    'Area Manager': row.get('Area Manager Name', '')
-                }
-        
-        # For AMs: lookup by Area Manager ID
-        am_lookup = {}
-        for _, row in team_hierarchy.drop_duplicates(subset=['Area Manager ID']).iterrows():
-            am_id = row.get('Area Manager ID')
-            if am_id:
-                am_lookup[am_id] = {
-                    'Director': row.get('Division Manager Name', '')
-                }
+    def export_email_list_file(self):
+        """Write the email directory back to EmailList.xlsx on the job thread."""
+        if self.start_job(lambda job: self.export_email_list(), self.on_email_list_exported):
+            self.sync_status.config(text="Exporting...", style="Info.TLabel")
+    
+    def on_email_list_exported(self, future):
+        """Show the export result."""
+        try:
+            count = future.result()
+        except Exception as e:
+            self.sync_status.config(text=f"Export error: {str(e)}", style="Error.TLabel")
+            return
         
-        # For Directors: no lookup needed (no hierarchy above within report)
+        self.seen_stamps['email'] = self.loaded_stamps.get('email')
+        self.sync_status.config(text=f"✓ Exported {count:,} records to {self.email_list_path.name}", style="Success.TLabel")
+    
+    def run_email_assessment(self):
+        """Run email assessment."""
+        memory_send = self.memory_send_var.get()
+        if memory_send and not self.selected_batch:
+            messagebox.showinfo("No Batch", "Run analysis for a batch first")
+            return
         
-        detail_columns = [
-            'Incentive #', 'SalesPersonID', 'Position ID', 'Territory ID', 
-            'Rep Name', 'Payout', 'Supplier', 'Desc', 'Sales Role', 
-            'Channel', 'Payout Type', 'Start Date', 'End Date', 
-            'Submitted By', 'Tracking Method', 'Paid On Batch', 'Batch Year'
-        ]
+        if not memory_send and not self.batch_files:
+            messagebox.showinfo("No Files", "Create batch files first")
+            return
         
-        sheets_data = {}
-        total_payout = 0
-        total_people = 0
+        if not self.email_index:
+            messagebox.showinfo("No Email List", "Load email list first")
+            return
         
-        for level in config['include_levels']:
-            id_col = level_id_cols[level]
-            label = level_labels[level]
-            
-            people_at_level = team_hierarchy[[id_col]].drop_duplicates()
-            people_ids = [x for x in people_at_level[id_col].dropna().unique() if x is not None]
-            
-            if not people_ids:
-                continue
-            
-            level_detail = batch_df[batch_df['SalesPersonID'].isin(people_ids)].copy()
-            
-            if level_detail.empty:
-                continue
-            
-            # Determine which hierarchy columns to include for this tab
-            # Include levels BETWEEN manager_level and current tab level
-            current_level_idx = level_order.index(level)
-            hier_cols_to_include = []
+        try:
+            if memory_send:
+                summary = self.batch_summary(self.selected_year, self.selected_batch)
+                if summary is None:
+                    self.email_mapping, self.missing_emails = {}, []
+                    self.assess_label1.config(text="No records found", style="Warning.TLabel")
+                    self.assess_label2.config(text="")
+                    self.test_btn.config(state=tk.DISABLED)
+                    self.send_btn.config(state=tk.DISABLED)
+                    return
+                filtered_df = self.filter_master_data(self.selected_year, self.selected_batch)
+                self.email_mapping, self.missing_emails = self.assess_batch_emails(
+                    self.selected_year, self.selected_batch, filtered_df
+                )
+                self.created_batch_folder = self.batch_folder(self.selected_year, self.selected_batch) / "Individual Emails"
+                total_files = summary['reps']
+            else:
+                self.email_mapping, self.missing_emails = self.assess_rep_emails(self.created_batch_folder, self.batch_files)
+                total_files = len(self.batch_files)
             
-            for hier_level in ['DIRECTOR', 'AM', 'FSM']:
-                hier_level_idx = level_order.index(hier_level)
-                # Include if it's between manager level and current tab level
-                if hier_level_idx > manager_level_idx and hier_level_idx < current_level_idx:
-                    if hier_level == 'DIRECTOR':
-                        hier_cols_to_include.append('Director')
-                    elif hier_level == 'AM':
-                        hier_cols_to_include.append('Area Manager')
-                    elif hier_level == 'FSM':
-                        hier_cols_to_include.append('FSM')
+            matched = len(self.email_mapping)
+            missing = len(self.missing_emails)
             
-            # Select the right lookup based on the level we're reporting on
-            if level == 'REP':
-                lookup = rep_lookup
-            elif level == 'FSM':
-                lookup = fsm_lookup
-            elif level == 'AM':
-                lookup = am_lookup
+            if missing == 0:
+                self.assess_label1.config(
+                    text=f"✓ All {total_files} files have valid email addresses!",
+                    style="Success.TLabel"
+                )
+                self.assess_label2.config(text="Ready to send emails.")
             else:
-                lookup = {}
-            
-            # Add hierarchy columns to detail
-            for col_name in hier_cols_to_include:
-                level_detail[col_name] = level_detail['SalesPersonID'].apply(
-                    lambda x: lookup.get(x, {}).get(col_name, '')
+                self.assess_label1.config(
+                    text=f"⚠ {matched} of {total_files} files have valid emails. {missing} missing.",
+                    style="Warning.TLabel"
                 )
+                
+                missing_text = "Missing: "
+                for item in self.missing_emails[:5]:
+                    missing_text += f"{item['SalesPersonID']} ({item['Reason']}), "
+                if len(self.missing_emails) > 5:
+                    missing_text += f"... +{len(self.missing_emails) - 5} more"
+                
+                self.assess_label2.config(text=missing_text.rstrip(", "))
             
-            # Summary - aggregate
-            agg_dict = {'Rep Name': 'first', 'Payout': 'sum', 'Incentive #': 'count'}
-            for col in hier_cols_to_include:
-                agg_dict[col] = 'first'
+            if matched > 0:
+                self.test_btn.config(state=tk.NORMAL)
+                self.send_btn.config(state=tk.NORMAL)
             
-            level_summary = level_detail.groupby('SalesPersonID').agg(agg_dict).reset_index()
+        except Exception as e:
+            self.assess_label1.config(text=f"Error: {str(e)}", style="Error.TLabel")
+    
+    def send_test_emails(self):
+        """Send 3 random test emails."""
+        error = self.transport_error()
+        if error:
+            messagebox.showerror("Mail Not Available", error)
+            return
+        
+        test_email = self.test_email_var.get().strip()
+        
+        if not test_email or '@' not in test_email:
+            messagebox.showerror("Invalid Email", "Please enter a valid test email address")
+            return
+        
+        if len(self.email_mapping) < 3:
+            messagebox.showerror("Not Enough Files", "Need at least 3 files with valid emails")
+            return
+        
+        try:
+            self.test_status.config(text="Sending...", style="Info.TLabel")
+            self.root.update()
             
-            # Rename columns
-            rename_cols = {'SalesPersonID': 'ID', 'Rep Name': 'Name', 'Payout': 'Total Payout', 'Incentive #': 'Incentive Count'}
-            level_summary = level_summary.rename(columns=rename_cols)
+            random_ids = random.sample(list(self.email_mapping.keys()), 3)
+            batch_month, batch_year = self.get_batch_display_info()
             
-            # Reorder: hierarchy cols FIRST, then ID, Name, Total Payout, Incentive Count
-            col_order = hier_cols_to_include + ['ID', 'Name', 'Total Payout', 'Incentive Count']
-            level_summary = level_summary[col_order]
-            level_summary = level_summary.sort_values('Total Payout', ascending=False)
+            with self.make_transport() as transport:
+                for sales_person_id in random_ids:
+                    info = self.email_mapping[sales_person_id]
+                    
+                    transport.send(self.create_email(
+                        recipient=info['email'],
+                        sales_person_id=sales_person_id,
+                        sales_person_name=info['name'],
+                        attachment=self.rep_attachment(info),
+                        batch_month=batch_month,
+                        batch_year=batch_year,
+                        is_test=True,
+                        test_email=test_email
+                    ))
             
-            # Detail - hierarchy columns first
-            available_detail_cols = [col for col in detail_columns if col in level_detail.columns]
-            level_detail_out = level_detail[hier_cols_to_include + available_detail_cols].copy()
-            level_detail_out = level_detail_out.sort_values(['Rep Name', 'Payout'], ascending=[True, False])
+            self.test_status.config(
+                text=f"✓ 3 test emails sent to {test_email}",
+                style="Success.TLabel"
+            )
             
-            sheets_data[f'{label} Summary'] = level_summary
-            sheets_data[f'{label} Detail'] = level_detail_out
+            messagebox.showinfo(
+                "Test Complete",
+                f"3 test emails sent to:\n{test_email}\n\n"
+                f"SalesPersonIDs:\n• {random_ids[0]}\n• {random_ids[1]}\n• {random_ids[2]}"
+            )
             
-            total_payout += level_summary['Total Payout'].sum()
-            total_people += len(level_summary)
+        except Exception as e:
+            self.test_status.config(text=f"Error: {str(e)}", style="Error.TLabel")
+            messagebox.showerror("Test Error", f"Failed:\n{str(e)}")
+    
+    def send_final_emails(self):
+        """Send all final emails on the job thread."""
+        error = self.transport_error()
+        if error:
+            messagebox.showerror("Mail Not Available", error)
+            return
         
-        if not sheets_data:
-            return None
+        if not self.email_mapping:
+            messagebox.showerror("No Emails", "Run assessment first")
+            return
+        
+        total_emails = len(self.email_mapping)
+        already_sent = self.already_sent('rep', self.email_mapping, 'file')
+        resume = self.ask_resume(already_sent, total_emails)
+        if resume is None:
+            return
+        if resume:
+            total_emails -= len(already_sent)
+        
+        if not messagebox.askyesno(
+            "Confirm Send",
+            f"Send {total_emails} emails?\n\n"
+            f"Batch: {self.created_batch_folder.name if self.created_batch_folder else 'Unknown'}\n"
+            f"CC: {self.cc_email}"
+        ):
+            return
         
-        manager_name_clean = str(manager_name).replace("/", "-").replace("\\", "-").replace(":", "-").replace("*", "-").replace("?", "-").strip()
-        filename = f"{manager_level}_{manager_id}_{manager_name_clean}.xlsx"
-        filepath = output_folder / filename
+        batch_month, batch_year = self.get_batch_display_info()
+        self.start_job(
+            self.send_rep_emails, self.on_rep_emails_sent,
+            dict(self.email_mapping), batch_month, batch_year, resume,
+            self.archive_var.get(), self.parallel_var.get()
+        )
+    
+    def ask_resume(self, already_sent, total):
+        """Ask whether to skip emails already sent: True resumes, False sends all, None aborts."""
+        if not already_sent:
+            return False
+        return messagebox.askyesnocancel(
+            "Resume Send",
+            f"{len(already_sent)} of {total} emails for this batch were already sent.\n\n"
+            f"Yes - send only the remaining {total - len(already_sent)}\n"
+            f"No - send all {total} again\n"
+            f"Cancel - don't send"
+        )
+    
+    def on_rep_emails_sent(self, future):
+        """Show the final send result."""
+        try:
+            sent_emails, failed_emails, cancelled = future.result()
+        except JobCancelled:
+            self.stage2_progress_label.config(text="Cancelled before any emails were sent")
+            return
+        except Exception as e:
+            self.stage2_progress_label.config(text=f"Error: {str(e)}")
+            messagebox.showerror("Send Error", f"Failed:\n{str(e)}")
+            return
         
-        with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-            summary_data = pd.DataFrame({
-                'Metric': ['Manager Level', 'Manager ID', 'Manager Name', 'Batch Period',
-                          'Total People with Incentives', 'Total Payout', 'Report Generated'],
-                'Value': [manager_level, manager_id, manager_name, f"{paid_on_batch} {batch_year}",
-                         total_people, f"${total_payout:,.2f}", datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
-            })
-            summary_data.to_excel(writer, sheet_name='Summary', index=False)
-            
-            for sheet_name, df in sheets_data.items():
-                df.to_excel(writer, sheet_name=sheet_name[:31], index=False)
+        if cancelled:
+            self.stage2_progress_label.config(text=f"Cancelled after {len(sent_emails)} sent.")
+        else:
+            self.stage2_progress_var.set(100)
+            self.stage2_progress_label.config(text=f"✓ Complete! {len(sent_emails)} sent.")
         
-        # Apply formatting (auto-width, header color, currency)
-        self.format_manager_report(filepath)
+        self.send_status.config(
+            text=f"✓ {len(sent_emails)} sent, {len(failed_emails)} failed",
+            style="Success.TLabel" if not failed_emails and not cancelled else "Warning.TLabel"
+        )
         
-        return filepath
+        messagebox.showinfo(
+            "Send Cancelled" if cancelled else "Send Complete",
+            f"Email distribution {'cancelled' if cancelled else 'complete'}!\n\n"
+            f"Sent: {len(sent_emails)}\n"
+            f"Failed: {len(failed_emails)}\n\n"
+            f"Recap sent to:\n• {self.recap_recipients[0]}\n• {self.recap_recipients[1]}"
+        )
+    
+    def open_output_folder(self):
+        """Open the output folder."""
+        if self.created_batch_folder and self.created_batch_folder.exists():
+            os.startfile(self.created_batch_folder)
+        else:
+            os.startfile(self.output_base)
+    
+    # ==========================================
+    # STAGE 3: MANAGEMENT REPORTING
+    # ==========================================
     
-    def format_manager_report(self, filepath):
-        """Format management report with auto-width, header color, and currency."""
-        wb = load_workbook(filepath)
+    def generate_management_reports(self):
+        """Generate management rollup reports on the job thread."""
+        if self.master_df is None or self.hierarchy_df is None:
+            messagebox.showinfo("Data Required", "Please ensure all data is loaded")
+            return
         
-        # Match individual report header color: #4472C4
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        header_alignment = Alignment(horizontal="center", vertical="center")
-        currency_format = '"$"#,##0.00'
+        year = self.year_var.get()
+        batch = self.batch_var.get()
         
-        for sheet_name in wb.sheetnames:
-            ws = wb[sheet_name]
-            
-            # Header formatting
-            for cell in ws[1]:
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = header_alignment
-            
-            # Find payout columns and format as currency
-            headers = {cell.value: cell.column for cell in ws[1]}
-            
-            payout_cols = [col for name, col in headers.items() 
-                          if name and ('payout' in str(name).lower())]
-            
-            for col_idx in payout_cols:
-                for row in range(2, ws.max_row + 1):
-                    ws.cell(row=row, column=col_idx).number_format = currency_format
-            
-            # Find date columns and format as short date
-            date_cols = [col for name, col in headers.items() 
-                        if name and ('start date' in str(name).lower() or 'end date' in str(name).lower())]
-            
-            for col_idx in date_cols:
-                for row in range(2, ws.max_row + 1):
-                    ws.cell(row=row, column=col_idx).number_format = 'MM/DD/YYYY'
-            
-            # Auto-width columns
-            for col_idx in range(1, ws.max_column + 1):
-                max_length = 0
-                column_letter = get_column_letter(col_idx)
-                
-                for row in range(1, ws.max_row + 1):
-                    cell = ws.cell(row=row, column=col_idx)
-                    try:
-                        if cell.value:
-                            cell_length = len(str(cell.value))
-                            if max_length < cell_length:
-                                max_length = cell_length
-                    except:
-                        pass
-                
-                # Add padding, cap at 60
-                adjusted_width = min(max_length + 6, 60)
-                ws.column_dimensions[column_letter].width = adjusted_width
+        if not year or not batch:
+            messagebox.showinfo("Selection Required", "Please select a batch first in Stage 1")
+            return
+        
+        batch_df = self.filter_master_data(year, batch)
         
-        wb.save(filepath)
+        job = self.start_job(
+            self.build_management_reports, self.on_management_reports_built,
+            year, batch, batch_df, self.parallel_var.get()
+        )
+        if job:
+            self.mgmt_reports = []
+            self.mgmt_gen_status.config(text="Generating...", style="Info.TLabel")
     
-    def create_master_summary_report(self, batch_df, batch_year, paid_on_batch, output_folder):
-        """Create a master summary report with all levels and VP hierarchy for filtering."""
+    def on_management_reports_built(self, future):
+        """Show the management report result and enable assessment."""
         try:
-            # Build complete hierarchy lookup for all people
-            hierarchy_lookup = {}
-            for _, row in self.hierarchy_df.iterrows():
-                for id_col in ['Sales Person ID', 'Field Sales Manager ID', 'Area Manager ID', 'Division Manager ID']:
-                    person_id = row.get(id_col)
-                    if person_id and person_id not in hierarchy_lookup:
-                        hierarchy_lookup[person_id] = {
-                            'VP': row.get('Vice President Name', ''),
-                            'Director': row.get('Division Manager Name', ''),
-                            'Area Manager': row.get('Area Manager Name', ''),
-                            'FSM': row.get('Field Sales Manager Name', '')
-                        }
-            
-            detail_columns = [
-                'Incentive #', 'SalesPersonID', 'Position ID', 'Territory ID', 
-                'Rep Name', 'Payout', 'Supplier', 'Desc', 'Sales Role', 
-                'Channel', 'Payout Type', 'Start Date', 'End Date', 
-                'Submitted By', 'Tracking Method', 'Paid On Batch', 'Batch Year'
-            ]
-            
-            level_id_cols = {
-                'DIRECTOR': 'Division Manager ID', 'AM': 'Area Manager ID',
-                'FSM': 'Field Sales Manager ID', 'REP': 'Sales Person ID'
-            }
-            level_labels = {'DIRECTOR': 'Director', 'AM': 'Area Mgr', 'FSM': 'FSM', 'REP': 'Rep'}
-            
-            sheets_data = {}
-            
-            for level in ['DIRECTOR', 'AM', 'FSM', 'REP']:
-                id_col = level_id_cols[level]
-                label = level_labels[level]
-                
-                # Get all unique people at this level
-                people_at_level = self.hierarchy_df[[id_col]].drop_duplicates()
-                people_ids = [x for x in people_at_level[id_col].dropna().unique() if x is not None]
-                
-                if not people_ids:
-                    continue
-                
-                # Get their incentive records
-                level_detail = batch_df[batch_df['SalesPersonID'].isin(people_ids)].copy()
-                
-                if level_detail.empty:
-                    continue
-                
-                # Add all hierarchy columns (including VP)
-                hier_cols = ['VP', 'Director', 'Area Manager', 'FSM']
-                for col_name in hier_cols:
-                    level_detail[col_name] = level_detail['SalesPersonID'].apply(
-                        lambda x: hierarchy_lookup.get(x, {}).get(col_name, '')
-                    )
-                
-                # Determine which hierarchy columns to show (levels above current)
-                if level == 'DIRECTOR':
-                    show_hier = ['VP']
-                elif level == 'AM':
-                    show_hier = ['VP', 'Director']
-                elif level == 'FSM':
-                    show_hier = ['VP', 'Director', 'Area Manager']
-                else:  # REP
-                    show_hier = ['VP', 'Director', 'Area Manager', 'FSM']
-                
-                # Summary
-                agg_dict = {'Rep Name': 'first', 'Payout': 'sum', 'Incentive #': 'count'}
-                for col in show_hier:
-                    agg_dict[col] = 'first'
-                
-                level_summary = level_detail.groupby('SalesPersonID').agg(agg_dict).reset_index()
-                level_summary = level_summary.rename(columns={
-                    'SalesPersonID': 'ID', 'Rep Name': 'Name', 
-                    'Payout': 'Total Payout', 'Incentive #': 'Incentive Count'
-                })
-                
-                col_order = show_hier + ['ID', 'Name', 'Total Payout', 'Incentive Count']
-                level_summary = level_summary[col_order]
-                level_summary = level_summary.sort_values('Total Payout', ascending=False)
-                
-                # Detail
-                available_detail_cols = [col for col in detail_columns if col in level_detail.columns]
-                level_detail_out = level_detail[show_hier + available_detail_cols].copy()
-                level_detail_out = level_detail_out.sort_values(['Rep Name', 'Payout'], ascending=[True, False])
-                
-                sheets_data[f'{label} Summary'] = level_summary
-                sheets_data[f'{label} Detail'] = level_detail_out
-            
-            if not sheets_data:
-                return None
-            
-            # Calculate totals
-            total_payout = batch_df['Payout'].sum()
-            total_people = batch_df['SalesPersonID'].nunique()
-            
-            filepath = output_folder / "_MANAGEMENT_SUMMARY.xlsx"
-            
-            with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-                # Summary sheet
-                summary_data = pd.DataFrame({
-                    'Metric': ['Report Type', 'Batch Period', 'Total People with Incentives', 
-                              'Total Payout', 'Report Generated'],
-                    'Value': ['Master Management Summary', f"{paid_on_batch} {batch_year}",
-                             total_people, f"${total_payout:,.2f}", 
-                             datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
-                })
-                summary_data.to_excel(writer, sheet_name='Summary', index=False)
-                
-                for sheet_name, df in sheets_data.items():
-                    df.to_excel(writer, sheet_name=sheet_name[:31], index=False)
-            
-            self.format_manager_report(filepath)
-            
+            result = future.result()
+        except JobCancelled:
+            # The output folder was cleared, so earlier reports are gone too
+            self.mgmt_assess_btn.config(state=tk.DISABLED)
+            self.mgmt_gen_status.config(text="Cancelled", style="Warning.TLabel")
+            self.stage3_progress_label.config(text="Cancelled - generate again for a complete set")
+            return
         except Exception as e:
-            print(f"Error creating master summary: {e}")
+            self.mgmt_gen_status.config(text=f"Error: {str(e)}", style="Error.TLabel")
+            messagebox.showerror("Error", f"Failed to generate reports:\n{str(e)}")
+            return
+        
+        self.mgmt_coverage_label.config(
+            text=result['coverage'],
+            style="Success.TLabel" if result['coverage_pct'] > 90 else "Warning.TLabel"
+        )
+        
+        self.mgmt_reports = result['reports']
+        self.mgmt_report_errors = result['errors']
+        created = len(self.mgmt_reports)
+        failed = len(self.mgmt_report_errors)
+        
+        self.stage3_progress['maximum'] = result['total']
+        self.stage3_progress['value'] = result['total']
+        self.mgmt_gen_status.config(
+            text=f"✓ Created {created} reports" + (f", {failed} failed" if failed else ""),
+            style="Warning.TLabel" if failed else "Success.TLabel"
+        )
+        self.stage3_progress_label.config(text=f"Complete: {created} management reports")
+        
+        if failed:
+            details = "\n".join(f"{e['level']} {e['id']} ({e['name']}): {e['error']}" for e in self.mgmt_report_errors[:10])
+            messagebox.showwarning(
+                "Some Reports Failed",
+                f"{failed} management report(s) could not be written:\n\n{details}"
+            )
+        
+        # Enable assessment button
+        if self.mgmt_reports:
+            self.mgmt_assess_btn.config(state=tk.NORMAL)
+        
+        # Store output folder
+        self.mgmt_output_folder = result['output_folder']
     
-    def run_mgmt_email_assessment(self):
-        """Assess email coverage for management reports."""
+    def run_mgmt_email_assessment(self, notify=True):
+        """Assess email coverage for management reports; notify=False only updates the status label."""
         if not self.mgmt_reports:
             messagebox.showinfo("No Reports", "Generate management reports first")
             return
         
-        if self.email_df is None:
+        if not self.email_index:
             messagebox.showinfo("No Email List", "Email list not loaded")
             return
         
         try:
-            self.mgmt_email_mapping = {}
-            self.mgmt_missing_emails = []
-            
-            for report in self.mgmt_reports:
-                mgr_id = report['id']
-                mgr_name = report['name']
-                
-                # Look up email
-                match = self.email_df[self.email_df['SU01 Acct #'] == mgr_id]
-                
-                if not match.empty:
-                    email = match.iloc[0].get('SU01 Email', '')
-                    if email and '@' in str(email):
-                        self.mgmt_email_mapping[mgr_id] = {
-                            'email': email,
-                            'name': mgr_name,
-                            'filepath': report['filepath'],
-                            'level': report['level']
-                        }
-                    else:
-                        self.mgmt_missing_emails.append({
-                            'id': mgr_id,
-                            'name': mgr_name,
-                            'reason': 'Invalid email'
-                        })
-                else:
-                    self.mgmt_missing_emails.append({
-                        'id': mgr_id,
-                        'name': mgr_name,
-                        'reason': 'ID not found in email list'
-                    })
+            self.mgmt_email_mapping, self.mgmt_missing_emails = self.assess_mgmt_emails(self.mgmt_reports)
             
             matched = len(self.mgmt_email_mapping)
             total = len(self.mgmt_reports)
@@ -1936,11 +3761,12 @@ Automated recap from Incentive Batch Manager
                 )
                 
                 # Show details of missing emails
-                missing_details = "The following managers are missing valid emails:\n\n"
-                for item in self.mgmt_missing_emails:
-                    missing_details += f"• {item['id']} - {item['name']} ({item['reason']})\n"
-                
-                messagebox.showwarning("Missing Emails", missing_details)
+                if notify:
+                    missing_details = "The following managers are missing valid emails:\n\n"
+                    for item in self.mgmt_missing_emails:
+                        missing_details += f"• {item['id']} - {item['name']} ({item['reason']})\n"
+                    
+                    messagebox.showwarning("Missing Emails", missing_details)
             
             if self.mgmt_email_mapping:
                 self.mgmt_test_btn.config(state=tk.NORMAL)
@@ -1949,60 +3775,11 @@ Automated recap from Incentive Batch Manager
         except Exception as e:
             self.mgmt_assess_status.config(text=f"Error: {str(e)}", style="Error.TLabel")
     
-    def create_mgmt_email(self, outlook, recipient, manager_id, manager_name, manager_level, 
-                          batch_month, batch_year, attachment_path, test_email=None):
-        """Create a management report email."""
-        mail = outlook.CreateItem(0)
-        
-        level_titles = {
-            'VP': 'Vice President',
-            'DIRECTOR': 'Division Manager',
-            'AM': 'Area Manager',
-            'FSM': 'Field Sales Manager'
-        }
-        level_title = level_titles.get(manager_level, manager_level)
-        
-        if test_email:
-            mail.To = test_email
-            mail.Subject = f"[TEST] Incentive Summary Report - {level_title} - {batch_month} {batch_year}"
-        else:
-            mail.To = recipient
-            mail.Subject = f"Incentive Summary Report - {level_title} - {batch_month} {batch_year}"
-            mail.CC = self.cc_email
-        
-        mail.SentOnBehalfOfName = self.sender_email
-        
-        mail.Body = ""  # Clear plain text body
-        mail.HTMLBody = f"""
-<html>
-<body style="font-family: Calibri, Arial, sans-serif; font-size: 11pt; color: #333333;">
-
-<p>{manager_name} ({manager_id}),</p>
-
-<p>Attached is your team's incentive summary report for the <strong>{batch_month} {batch_year}</strong> payment period.</p>
-
-<p>This report provides a detailed breakdown of incentive earnings for your team members, including:</p>
-<ul style="margin-left: 20px;">
-    <li>Summary tabs showing total payouts by team member</li>
-    <li>Detail tabs with individual incentive line items</li>
-</ul>
-
-<p>Please review the report to understand your team's incentive performance. If you have questions about the calculations or need additional information, please contact the CA Analytics Team at <a href="mailto:CAAnalyticsAll@breakthrubev.com" style="color: #0563C1;">CAAnalyticsAll@breakthrubev.com</a></p>
-
-<p style="margin-top: 20px;">-Analytics Team</p>
-
-</body>
-</html>
-"""
-        
-        mail.Attachments.Add(str(attachment_path))
-        
-        return mail
-    
     def send_mgmt_test_emails(self):
         """Send test management emails."""
-        if not OUTLOOK_AVAILABLE:
-            messagebox.showerror("Error", "Outlook not available")
+        error = self.transport_error()
+        if error:
+            messagebox.showerror("Error", error)
             return
         
         test_email = self.mgmt_test_email_var.get().strip()
@@ -2015,8 +3792,6 @@ Automated recap from Incentive Batch Manager
             return
         
         try:
-            outlook = win32.Dispatch('Outlook.Application')
-            
             # Select up to 3 random managers
             sample_ids = random.sample(
                 list(self.mgmt_email_mapping.keys()),
@@ -2027,15 +3802,15 @@ Automated recap from Incentive Batch Manager
             batch_year = self.year_var.get()
             
             sent = 0
-            for mgr_id in sample_ids:
-                info = self.mgmt_email_mapping[mgr_id]
-                
-                mail = self.create_mgmt_email(
-                    outlook, info['email'], mgr_id, info['name'], info['level'],
-                    batch_month, batch_year, info['filepath'], test_email=test_email
-                )
-                mail.Send()
-                sent += 1
+            with self.make_transport() as transport:
+                for mgr_id in sample_ids:
+                    info = self.mgmt_email_mapping[mgr_id]
+                    
+                    transport.send(self.create_mgmt_email(
+                        info['email'], mgr_id, info['name'], info['level'],
+                        batch_month, batch_year, info['filepath'], test_email=test_email
+                    ))
+                    sent += 1
             
             messagebox.showinfo("Test Sent", f"Sent {sent} test emails to {test_email}")
             
@@ -2043,9 +3818,10 @@ Automated recap from Incentive Batch Manager
             messagebox.showerror("Error", f"Failed to send test emails:\n{str(e)}")
     
     def send_mgmt_final_emails(self):
-        """Send final management emails."""
-        if not OUTLOOK_AVAILABLE:
-            messagebox.showerror("Error", "Outlook not available")
+        """Send final management emails on the job thread."""
+        error = self.transport_error()
+        if error:
+            messagebox.showerror("Error", error)
             return
         
         if not self.mgmt_email_mapping:
@@ -2053,123 +3829,296 @@ Automated recap from Incentive Batch Manager
             return
         
         count = len(self.mgmt_email_mapping)
+        already_sent = self.already_sent('mgmt', self.mgmt_email_mapping, 'filepath')
+        resume = self.ask_resume(already_sent, count)
+        if resume is None:
+            return
+        if resume:
+            count -= len(already_sent)
+        
         if not messagebox.askyesno("Confirm Send", f"Send {count} management report emails?"):
             return
         
-        try:
-            outlook = win32.Dispatch('Outlook.Application')
-            
-            batch_month = self.batch_var.get()
-            batch_year = self.year_var.get()
-            
+        job = self.start_job(
+            self.send_mgmt_emails, self.on_mgmt_emails_sent,
+            dict(self.mgmt_email_mapping), self.batch_var.get(), self.year_var.get(), resume
+        )
+        if job:
             self.stage3_progress['maximum'] = count
             self.stage3_progress['value'] = 0
-            
-            sent_emails = []
-            failed_emails = []
-            
-            for i, (mgr_id, info) in enumerate(self.mgmt_email_mapping.items()):
-                try:
-                    mail = self.create_mgmt_email(
-                        outlook, info['email'], mgr_id, info['name'], info['level'],
-                        batch_month, batch_year, info['filepath']
-                    )
-                    mail.Send()
-                    
-                    sent_emails.append({
-                        'ManagerID': mgr_id,
-                        'Name': info['name'],
-                        'Level': info['level'],
-                        'Email': info['email']
-                    })
-                    
-                except Exception as e:
-                    failed_emails.append({
-                        'ManagerID': mgr_id,
-                        'Name': info['name'],
-                        'Level': info['level'],
-                        'Status': str(e)
-                    })
-                
-                self.stage3_progress['value'] = i + 1
-                self.stage3_progress_label.config(text=f"Sending {i+1} of {count}...")
-                self.root.update()
-            
-            self.mgmt_send_status.config(
-                text=f"✓ Sent {len(sent_emails)}, Failed {len(failed_emails)}",
-                style="Success.TLabel" if not failed_emails else "Warning.TLabel"
-            )
-            self.stage3_progress_label.config(text=f"Complete: {len(sent_emails)} sent, {len(failed_emails)} failed")
-            
-            # Send recap
-            self.send_mgmt_recap_email(outlook, sent_emails, failed_emails, batch_month, batch_year)
-            
-            messagebox.showinfo("Complete", f"Sent {len(sent_emails)} management emails")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to send emails:\n{str(e)}")
     
-    def send_mgmt_recap_email(self, outlook, sent_emails, failed_emails, batch_month, batch_year):
-        """Send recap email for management report distribution."""
+    def on_mgmt_emails_sent(self, future):
+        """Show the management send result."""
         try:
-            mail = outlook.CreateItem(0)
-            mail.To = "; ".join(self.recap_recipients)
-            mail.Subject = f"Management Incentive Report Distribution Recap - {batch_month} {batch_year}"
-            mail.SentOnBehalfOfName = self.sender_email
-            
-            total_sent = len(sent_emails)
-            total_failed = len(failed_emails)
-            success_rate = (total_sent / (total_sent + total_failed) * 100) if (total_sent + total_failed) > 0 else 0
-            
-            body = f"""
-MANAGEMENT INCENTIVE REPORT DISTRIBUTION RECAP
-{'='*50}
+            sent_emails, failed_emails, cancelled = future.result()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to send emails:\n{str(e)}")
+            return
+        
+        self.stage3_progress['value'] = len(sent_emails) + len(failed_emails)
+        self.mgmt_send_status.config(
+            text=f"✓ Sent {len(sent_emails)}, Failed {len(failed_emails)}",
+            style="Success.TLabel" if not failed_emails and not cancelled else "Warning.TLabel"
+        )
+        self.stage3_progress_label.config(
+            text=f"{'Cancelled' if cancelled else 'Complete'}: {len(sent_emails)} sent, {len(failed_emails)} failed"
+        )
+        
+        messagebox.showinfo(
+            "Cancelled" if cancelled else "Complete",
+            f"Sent {len(sent_emails)} management emails"
+        )
 
-Batch: {batch_month} {batch_year}
-Date Sent: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 
-SUMMARY
-{'-'*30}
-Total Emails Sent: {total_sent}
-Total Failed: {total_failed}
-Success Rate: {success_rate:.1f}%
+# ==========================================
+# COMMAND LINE
+# ==========================================
 
+def build_parser():
+    """Argument parser for headless runs (no command starts the GUI)."""
+    paths = argparse.ArgumentParser(add_help=False)
+    paths.add_argument('--source', type=Path, help="Master Incentive Log workbook")
+    paths.add_argument('--email-list', type=Path, help="EmailList workbook")
+    paths.add_argument('--email-db', type=Path, help="Email directory database (default: one per email list under %%LOCALAPPDATA%%)")
+    paths.add_argument('--hierarchy', type=Path, help="CA_Sales Detail workbook")
+    paths.add_argument('--output', type=Path, help="Output base folder")
+    paths.add_argument('--serial', action='store_true', help="Write workbooks in this process instead of the worker pool")
+    paths.add_argument('--excel-engine', choices=EXCEL_ENGINES, help="Workbook parser (default: calamine if installed)")
+    
+    common = argparse.ArgumentParser(add_help=False, parents=[paths])
+    common.add_argument('--year', required=True, help="Batch Year, e.g. 2026")
+    common.add_argument('--batch', required=True, help="Paid On Batch, e.g. 10/15")
+    
+    mail = argparse.ArgumentParser(add_help=False)
+    mail.add_argument('--transport', choices=list(MAIL_BACKENDS), default='outlook', help="Mail backend (default: outlook)")
+    mail.add_argument('--smtp-host', help="SMTP server (default: $INCENTIVE_SMTP_HOST); password from $INCENTIVE_SMTP_PASSWORD")
+    mail.add_argument('--smtp-port', type=int, help="SMTP port (default: $INCENTIVE_SMTP_PORT or 587)")
+    mail.add_argument('--smtp-user', help="SMTP login (default: $INCENTIVE_SMTP_USER)")
+    mail.add_argument('--no-starttls', action='store_true', help="Send without STARTTLS (local debugging servers)")
+    mail.add_argument('--eml-folder', type=Path, help="Folder for --transport file (default: <output>/Outbox)")
+    mail.add_argument('--concurrency', type=int, help="Parallel sends for SMTP/.eml (default: 4)")
+    mail.add_argument('--rate', type=float, help="Max messages per second, 0 for unlimited (default: 5)")
+    
+    parser = argparse.ArgumentParser(description="Incentive Batch Manager. Run without a command to start the GUI.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    preview = commands.add_parser('preview', parents=[common], help="Show a batch's record count, reps and payout")
+    preview.add_argument('--by', choices=BATCH_CUBE_COLUMNS, help="Also break the batch down by rep, supplier or channel")
+    commands.add_parser('split', parents=[common], help="Create the per-rep files for a batch")
+    assess = commands.add_parser('assess', parents=[common], help="Check email coverage for a batch's files")
+    assess.add_argument('--mgmt', action='store_true', help="Assess the management reports instead of rep files")
+    assess.add_argument('--verify', action='store_true', help="Check every rep file's full checksum against the manifest")
+    commands.add_parser('mgmt', parents=[common], help="Generate the management reports for a batch")
+    send = commands.add_parser('send', parents=[common, mail], help="Email a batch's files and the recap")
+    send.add_argument('--mgmt', action='store_true', help="Send the management reports instead of rep files")
+    send.add_argument('--yes', action='store_true', help="Actually send (otherwise only report what would go out)")
+    send.add_argument('--resume', action='store_true', help="Skip emails the batch's send journal records as sent")
+    send.add_argument('--in-memory', action='store_true', help="Render rep workbooks from the master data at send time (no split needed)")
+    send.add_argument('--no-archive', action='store_true', help="With --in-memory, don't write archive copies to the output folder")
+    recap = commands.add_parser('recap', parents=[common, mail], help="Rebuild the send recap from the batch's send journal")
+    recap.add_argument('--mgmt', action='store_true', help="Management report sends instead of rep emails")
+    recap.add_argument('--yes', action='store_true', help="Email the recap (otherwise only print it)")
+    sync = commands.add_parser('sync-emails', parents=[paths], help="Upsert a ZREPCHECKNEW extract into the email directory")
+    sync.add_argument('zrep', type=Path, nargs='?', help="ZREPCHECKNEW workbook (omit to only export)")
+    sync.add_argument('--export', action='store_true', help="Also write the directory back to the EmailList workbook")
+    return parser
 
-DETAILED SEND LOG
-{'-'*30}
-"""
-            
-            # Group by level
-            for level in ['VP', 'DIRECTOR', 'AM', 'FSM']:
-                level_sent = [e for e in sent_emails if e['Level'] == level]
-                if level_sent:
-                    body += f"\n{level}s:\n"
-                    for item in level_sent:
-                        body += f"  ✓ {item['ManagerID']} | {item['Name']} | {item['Email']}\n"
-            
-            if failed_emails:
-                body += f"""
 
-FAILED SENDS
-{'-'*30}
-"""
-                for item in failed_emails:
-                    body += f"✗ {item['ManagerID']} | {item['Name']} | {item['Status']}\n"
-            
-            body += f"""
+def configure_mail(engine, args):
+    """Apply the mail command line options. Returns an error message or None."""
+    engine.mail_backend = args.transport
+    for attr, value in [('smtp_host', args.smtp_host), ('smtp_port', args.smtp_port),
+                        ('smtp_username', args.smtp_user), ('eml_folder', args.eml_folder),
+                        ('send_concurrency', args.concurrency), ('send_rate', args.rate)]:
+        if value is not None:
+            setattr(engine, attr, value)
+    engine.smtp_starttls = not args.no_starttls
+    return engine.transport_error()
 
-{'='*50}
-Automated recap from Incentive Batch Manager
-"""
-            
-            mail.Body = body
-            mail.Send()
-            
-        except Exception as e:
-            messagebox.showwarning("Recap Warning", f"Emails sent but recap failed:\n{str(e)}")
+
+def run_cli(args):
+    """Run one pipeline stage headlessly. Returns the process exit code."""
+    engine = IncentiveBatchEngine()
+    for attr, value in [('source_path', args.source), ('email_list_path', args.email_list),
+                        ('hierarchy_path', args.hierarchy), ('output_base', args.output),
+                        ('email_directory_path', args.email_db)]:
+        if value is not None:
+            setattr(engine, attr, value)
+    
+    if args.excel_engine == 'calamine' and not CALAMINE_AVAILABLE:
+        print("Error: the calamine engine needs the python-calamine package")
+        return 1
+    if args.excel_engine is not None:
+        engine.excel_engine = args.excel_engine
+    
+    if args.command == 'sync-emails':
+        try:
+            # Picks up EmailList.xlsx edits made since the last import/export first
+            engine.load_sources(master=False, email=True)
+            if args.zrep is not None:
+                inserted, updated = engine.sync_email_directory(args.zrep)
+                print(f"{len(inserted)} inserted, {len(updated)} updated | {len(engine.email_index):,} IDs in directory")
+            if args.export:
+                print(f"Exported {engine.export_email_list():,} records to {engine.email_list_path}")
+            else:
+                print(f"{engine.pending_email_export()} changes not yet exported (pass --export)")
+            return 0
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            return 1
+    
+    engine.selected_year = args.year
+    engine.selected_batch = args.batch
+    
+    # Headless stages run inline; progress callbacks are invoked directly
+    job = BackgroundJob(lambda callback, *callback_args: callback(*callback_args))
+    parallel = not args.serial
+    
+    try:
+        if args.command == 'preview':
+            engine.load_sources(master=True)
+            summary = engine.batch_summary(args.year, args.batch)
+            if summary is None:
+                print("No records found")
+                return 1
+            
+            print(f"Records: {summary['rows']:,} | Unique Reps: {summary['reps']} | Total Payout: ${summary['payout']:,.2f}")
+            if args.by:
+                for value, rows, payout in engine.batch_breakdown(args.year, args.batch, args.by).itertuples(name=None):
+                    print(f"  {value}: {rows:,} records, ${payout:,.2f}")
+            return 0
+        
+        if args.command == 'split':
+            engine.load_sources(master=True)
+            filtered_df = engine.filter_master_data(args.year, args.batch)
+            if filtered_df.empty:
+                print("No records found")
+                return 1
+            
+            result = engine.split_batch(job, args.year, args.batch, filtered_df, parallel)
+            print(
+                f"{result['files_created']} files created, {result['unchanged']} unchanged, "
+                f"{result['removed']} removed | {result['total_records']:,} records, "
+                f"${result['total_payout']:,.2f} payout\n{result['folder']}"
+            )
+            return 0
+        
+        if args.command == 'mgmt':
+            engine.load_sources(master=True, hierarchy=True)
+            batch_df = engine.filter_master_data(args.year, args.batch)
+            result = engine.build_management_reports(job, args.year, args.batch, batch_df, parallel)
+            print(result['coverage'])
+            print(f"{len(result['reports'])} management reports created\n{result['output_folder']}")
+            for error in result['errors']:
+                print(f"FAILED {error['level']} {error['id']} ({error['name']}): {error['error']}")
+            return 1 if result['errors'] else 0
+        
+        if args.command == 'recap':
+            folder = engine.batch_folder(args.year, args.batch)
+            engine.created_batch_folder = folder
+            if args.mgmt:
+                sent_emails, failed_emails = engine.mgmt_recap_lists(engine.read_send_journal(folder, 'mgmt'))
+                batch_month, batch_year = args.batch, args.year
+            else:
+                manifest = engine.read_rep_manifest(folder / "Individual Emails")
+                sent_emails, failed_emails = engine.rep_recap_lists(
+                    engine.read_send_journal(folder, 'rep'), payouts={key: entry['payout'] for key, entry in manifest.items()}
+                )
+                batch_month, batch_year = engine.get_batch_display_info()
+            
+            print(f"{len(sent_emails)} sent, {len(failed_emails)} failed per the send journal")
+            for item in failed_emails:
+                print(f"  failed: {item.get('SalesPersonID', item.get('ManagerID'))} - {item['Name']} ({item['Status']})")
+            if not args.yes:
+                return 0
+            
+            error = configure_mail(engine, args)
+            if error:
+                print(error)
+                return 1
+            with engine.make_transport() as transport:
+                if args.mgmt:
+                    engine.send_mgmt_recap_email(transport, sent_emails, failed_emails, batch_month, batch_year)
+                else:
+                    engine.send_recap_email(transport, sent_emails, failed_emails, batch_month, batch_year)
+            print(f"Recap sent to {', '.join(engine.recap_recipients)}")
+            return 0
+        
+        # assess / send work from the files already written for the batch
+        in_memory = args.command == 'send' and args.in_memory and not args.mgmt
+        engine.load_sources(master=in_memory, email=True)
+        if in_memory:
+            summary = engine.batch_summary(args.year, args.batch)
+            if summary is None:
+                print("No records found")
+                return 1
+            filtered_df = engine.filter_master_data(args.year, args.batch)
+            mapping, missing = engine.assess_batch_emails(args.year, args.batch, filtered_df)
+            total = summary['reps']
+            missing_lines = [f"{item['SalesPersonID']} - {item['File']} ({item['Reason']})" for item in missing]
+        elif args.mgmt:
+            reports = engine.list_mgmt_reports(engine.batch_folder(args.year, args.batch) / "Management Reports")
+            mapping, missing = engine.assess_mgmt_emails(reports)
+            total = len(reports)
+            missing_lines = [f"{item['id']} - {item['name']} ({item['reason']})" for item in missing]
+        else:
+            individual_folder = engine.batch_folder(args.year, args.batch) / "Individual Emails"
+            manifest = list(engine.read_rep_manifest(individual_folder).values())
+            if not manifest:
+                print(f"No batch manifest in {individual_folder}; run split first")
+                return 1
+            mapping, missing = engine.assess_rep_emails(individual_folder, manifest, verify=args.command == 'assess' and args.verify)
+            total = len(manifest)
+            missing_lines = [f"{item['SalesPersonID']} - {item['File']} ({item['Reason']})" for item in missing]
+        
+        print(f"{len(mapping)} of {total} files have valid emails, {len(missing)} missing")
+        for line in missing_lines:
+            print(f"  missing: {line}")
+        
+        if args.command == 'assess':
+            return 0 if not missing else 1
+        
+        error = configure_mail(engine, args)
+        if error:
+            print(error)
+            return 1
+        if not mapping:
+            print("Nothing to send")
+            return 1
+        
+        kind, path_key = ('mgmt', 'filepath') if args.mgmt else ('rep', 'file')
+        already_sent = engine.already_sent(kind, mapping, path_key) if args.resume else set()
+        if not args.yes:
+            print(f"Would send {len(mapping) - len(already_sent)} emails"
+                  f"{f' ({len(already_sent)} already sent)' if already_sent else ''}; pass --yes to send")
+            return 0
+        
+        engine.created_batch_folder = engine.batch_folder(args.year, args.batch)
+        if args.mgmt:
+            sent_emails, failed_emails, _ = engine.send_mgmt_emails(job, mapping, args.batch, args.year, args.resume)
+        else:
+            sent_emails, failed_emails, _ = engine.send_rep_emails(
+                job, mapping, *engine.get_batch_display_info(), args.resume, not args.no_archive, parallel
+            )
+        print(f"{len(sent_emails)} sent, {len(failed_emails)} failed")
+        return 1 if failed_emails else 0
+    
+    # Missing or locked workbooks and files lacking a required column
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        engine.shutdown_workers()
 
 
-def main():
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        return run_cli(build_parser().parse_args(argv))
+    
+    if not TK_AVAILABLE:
+        print("The GUI needs tkinter; pass a command to run headless (see --help)")
+        return 1
+    
     root = tk.Tk()
     
     window_width = 750
@@ -2182,7 +4131,10 @@ def main():
     
     app = IncentiveBatchManager(root)
     root.mainloop()
+    app.shutdown_workers()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Worker processes re-import this script; required for frozen builds
+    multiprocessing.freeze_support()
+    sys.exit(main())
\ No newline at end of file